@@ -1,8 +1,32 @@
+import argparse
+import contextlib
+import csv
+import hashlib
+import heapq
+import itertools
+import json
 import pygame
+from collections import OrderedDict, deque
 import random
 import math
-#initionalizing pygame
-pygame.init()
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for the array enemy backend
+    np = None
+
+from punchgame_telemetry import TelemetryBus, TelemetryWriter
+
+# Startup milestones as (name, perf_counter time), for startup_report
+_startup_marks = [("modules imported", time.perf_counter())]
+# pygame subsystems are initialized on first use (see init_display and get_font),
+# so headless runs never start video, audio or joysticks
 
 # Constants
 SCREEN_WIDTH = 800
@@ -25,10 +49,628 @@ PURPLE = (148, 0, 211)
 CYAN = (0, 255, 255)
 GOLD = (255, 215, 0)
 
+SKIN_SHADOW = (220, 180, 140)
+
+# Never used by a figure, so it marks transparent pixels in cached sprites
+SPRITE_COLORKEY = (255, 0, 255)
+# Fist sprites are pre-rendered for this many punch directions
+FIST_ANGLE_BUCKETS = 64
+
+POWERUP_TYPES = ("speed", "invincible")
+
+# Spatial hash cell size; at least as big as the largest entity
+GRID_CELL_SIZE = 64
+
+class TickInput:
+    """Player input for a single simulation tick"""
+    def __init__(self, left=False, right=False, up=False, down=False,
+                 punch=False, aim_x=0, aim_y=0):
+        self.left = left
+        self.right = right
+        self.up = up
+        self.down = down
+        self.punch = punch  # Punch pressed this tick
+        self.aim_x = aim_x  # Punch target (mouse position in the windowed game)
+        self.aim_y = aim_y
+    
+    def buttons(self):
+        """Held keys and punch press as a bit field, as stored in recordings"""
+        return (bool(self.left) | bool(self.right) << 1 | bool(self.up) << 2
+                | bool(self.down) << 3 | bool(self.punch) << 4)
+
+class Recording:
+    """Seed plus per-tick inputs of one game, in a compact binary format.
+    
+    Each tick is one byte of button bits (TickInput.buttons); ticks with a punch
+    press are followed by the aim point as two float64s, since aim is only read
+    when punching. Replaying the inputs into a Game with the same seed reproduces
+    the run exactly.
+    """
+    MAGIC = b"ZPRC"
+    # 2: state digests hash positions and the punch angle as floats
+    VERSION = 2
+    HEADER = struct.Struct("<4sHQI16s")  # magic, version, seed, ticks, final state digest
+    AIM = struct.Struct("<dd")
+    
+    def __init__(self, seed):
+        self.seed = seed
+        self.ticks = 0
+        self.final_digest = bytes(16)  # Game.state_digest() at the end of the run, if known
+        self.data = bytearray()
+    
+    def __len__(self):
+        return self.ticks
+    
+    def append(self, inputs):
+        buttons = inputs.buttons()
+        self.data.append(buttons)
+        if inputs.punch:
+            self.data += self.AIM.pack(inputs.aim_x, inputs.aim_y)
+        self.ticks += 1
+    
+    def finish(self, game):
+        """Store the game's final state digest so replays can be checked against it"""
+        self.final_digest = game.state_digest()
+    
+    def inputs(self):
+        """Yield the recorded TickInputs in order"""
+        data = self.data
+        offset = 0
+        for _ in range(self.ticks):
+            buttons = data[offset]
+            offset += 1
+            inputs = TickInput(left=bool(buttons & 1), right=bool(buttons & 2),
+                               up=bool(buttons & 4), down=bool(buttons & 8),
+                               punch=bool(buttons & 16))
+            if inputs.punch:
+                inputs.aim_x, inputs.aim_y = self.AIM.unpack_from(data, offset)
+                offset += self.AIM.size
+            yield inputs
+    
+    def player(self):
+        """Policy for Game.run / Game.run_headless that plays the recording back"""
+        inputs = self.inputs()
+        return lambda game: next(inputs, None)
+    
+    def to_bytes(self):
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, self.seed, self.ticks, self.final_digest)
+        return header + bytes(self.data)
+    
+    @classmethod
+    def from_bytes(cls, buffer):
+        magic, version, seed, ticks, final_digest = cls.HEADER.unpack_from(buffer)
+        if magic != cls.MAGIC:
+            raise ValueError("not a Zombie Puncher recording")
+        if version != cls.VERSION:
+            raise ValueError(f"recording format version {version} is not supported "
+                             f"(this build reads version {cls.VERSION}); record it again")
+        recording = cls(seed)
+        recording.ticks = ticks
+        recording.final_digest = final_digest
+        recording.data = bytearray(buffer[cls.HEADER.size:])
+        return recording
+    
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+    
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+class SpatialHash:
+    """Uniform grid that buckets entities by their center point for proximity queries"""
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.pending = None  # Entities to index before the next query (see mark_stale)
+    
+    def clear(self):
+        self.pending = None
+        self.cells.clear()
+    
+    def insert(self, entity):
+        center_x = entity.x + entity.width // 2
+        center_y = entity.y + entity.height // 2
+        key = (int(center_x // self.cell_size), int(center_y // self.cell_size))
+        bucket = self.cells.get(key)
+        if bucket is None:
+            self.cells[key] = [entity]
+        else:
+            bucket.append(entity)
+    
+    def rebuild(self, entities):
+        """Re-index all entities now"""
+        self.pending = None
+        self.cells.clear()
+        for entity in entities:
+            self.insert(entity)
+    
+    def mark_stale(self, entities):
+        """Re-index entities on the next query instead of now, so ticks without a query skip it"""
+        self.pending = entities
+    
+    def query(self, x, y, radius):
+        """Yield entities in every cell touched by the square around (x, y).
+        
+        This is a broad phase: callers still do their own exact distance test.
+        """
+        if self.pending is not None:
+            self.rebuild(self.pending)
+        size = self.cell_size
+        min_cx = int((x - radius) // size)
+        max_cx = int((x + radius) // size)
+        min_cy = int((y - radius) // size)
+        max_cy = int((y + radius) // size)
+        cells = self.cells
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    yield from bucket
+
+def mark_startup(name):
+    """Record a startup milestone (only its first occurrence counts)"""
+    if all(mark != name for mark, _ in _startup_marks):
+        _startup_marks.append((name, time.perf_counter()))
+
+def _process_age():
+    """Seconds since this process started, from /proc on Linux (10 ms resolution), else None"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesized command name; starttime is field 22
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+def startup_report():
+    """Lines timing each startup milestone from process start (or from the first milestone)"""
+    now = time.perf_counter()
+    age = _process_age()
+    origin = now - age if age is not None else _startup_marks[0][1]
+    lines = [f"{'process start' if age is not None else _startup_marks[0][0]}: 0.0 ms"]
+    previous = origin
+    for name, at in _startup_marks:
+        if age is None and at == origin:
+            continue
+        lines.append(f"{name}: {(at - origin) * 1000:.1f} ms (+{(at - previous) * 1000:.1f})")
+        previous = at
+    return lines
+
+def init_display():
+    """Start pygame's video subsystem (and nothing else) for a windowed game"""
+    if not pygame.display.get_init():
+        pygame.display.init()
+        mark_startup("display initialized")
+
+_fonts = {}
+
+def get_font(size, name=None):
+    """Shared Font for (name, size); constructing one hits disk and FreeType.
+    
+    The default font comes from the loaded atlas when it has that size.
+    """
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        if name is None and _atlas is not None and size in _atlas.fonts:
+            font = _atlas.fonts[size]
+        else:
+            font = load_font(size, name)
+        _fonts[key] = font
+    return font
+
+def load_font(size, name=None):
+    """A real pygame Font, initializing the font subsystem on first use"""
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.Font(name, size)
+
+class TextCache:
+    """Rendered text surfaces keyed by (font, text, color), evicting least recently used"""
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+    
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            return surface
+        surface = font.render(text, True, color)
+        self.entries[key] = surface
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surface
+
+def draw_player_figure(surface, x, y, arms):
+    """Draw the player's body with its top-left corner at (x, y)"""
+    center_x = x + 25
+    
+    # Legs
+    pygame.draw.rect(surface, BLUE, (x + 5, y + 50, 15, 30))  # Left leg
+    pygame.draw.rect(surface, BLUE, (x + 30, y + 50, 15, 30))  # Right leg
+    
+    # Body (torso)
+    pygame.draw.rect(surface, RED, (x + 10, y + 25, 30, 30))
+    
+    # Head
+    pygame.draw.circle(surface, SKIN_TONE, (center_x, y + 15), 15)
+    
+    # Eyes
+    pygame.draw.circle(surface, BLACK, (center_x - 5, y + 12), 3)
+    pygame.draw.circle(surface, BLACK, (center_x + 5, y + 12), 3)
+    
+    # Mouth
+    pygame.draw.arc(surface, BLACK, (center_x - 6, y + 15, 12, 8), 3.14, 6.28, 2)
+    
+    # Arms (when not punching)
+    if arms:
+        pygame.draw.rect(surface, SKIN_TONE, (x, y + 30, 10, 20))  # Left arm
+        pygame.draw.rect(surface, SKIN_TONE, (x + 40, y + 30, 10, 20))  # Right arm
+
+class AttackShape:
+    """Geometry of an animated attack figure, defined pointing right (angle 0).
+    
+    Parts are (points, fill_color, outline_color); two-point parts are lines.
+    All points are rotated together in one pass with a single sin/cos, and the
+    result is cached per quantized angle bucket, so drawing an attack never
+    repeats trig for the same direction.
+    """
+    def __init__(self, parts, buckets=FIST_ANGLE_BUCKETS):
+        self.parts = parts
+        self.buckets = buckets
+        self.points = [point for points, _, _ in parts for point in points]
+        self._rotated = {}
+    
+    def bucket(self, angle):
+        """Nearest pre-rotated direction for an angle in radians"""
+        return round(angle * self.buckets / (2 * math.pi)) % self.buckets
+    
+    def rotated(self, bucket):
+        """The parts rotated to a bucket's direction, computed once per bucket"""
+        parts = self._rotated.get(bucket)
+        if parts is None:
+            angle = bucket * 2 * math.pi / self.buckets
+            c = math.cos(angle)
+            s = math.sin(angle)
+            points = [(px * c - py * s, px * s + py * c) for px, py in self.points]
+            parts = []
+            start = 0
+            for base_points, fill, outline in self.parts:
+                parts.append((points[start:start + len(base_points)], fill, outline))
+                start += len(base_points)
+            self._rotated[bucket] = parts
+        return parts
+    
+    def draw(self, surface, x, y, bucket):
+        """Draw the shape centered on (x, y), pointing in the bucket's direction"""
+        for points, fill, outline in self.rotated(bucket):
+            placed = [(x + px, y + py) for px, py in points]
+            if fill is not None:
+                pygame.draw.polygon(surface, fill, placed)
+            if outline is not None:
+                if len(placed) == 2:
+                    pygame.draw.line(surface, outline, placed[0], placed[1], 2)
+                else:
+                    pygame.draw.polygon(surface, outline, placed, 2)
+
+FIST_SHAPE = AttackShape([
+    # Main fist body (knuckles)
+    ([
+        (-10, -15),  # Top left
+        (15, -15),   # Top right
+        (20, -5),    # Right knuckle
+        (20, 10),    # Bottom right
+        (-10, 10),   # Bottom left
+        (-15, 0)     # Left side
+    ], SKIN_TONE, SKIN_SHADOW),
+    # Thumb
+    ([(-10, -5), (-18, -8), (-18, 5), (-10, 8)], SKIN_TONE, SKIN_SHADOW),
+    # Knuckle details (small lines)
+    ([(5, -15), (5, -10)], None, SKIN_SHADOW),
+    ([(10, -15), (10, -10)], None, SKIN_SHADOW),
+    ([(15, -15), (15, -10)], None, SKIN_SHADOW),
+])
+
+def draw_enemy_figure(surface, x, y):
+    """Draw a zombie with its top-left corner at (x, y)"""
+    center_x = x + 20
+    
+    # Legs (torn pants)
+    pygame.draw.rect(surface, GRAY, (x + 5, y + 40, 12, 20))  # Left leg
+    pygame.draw.rect(surface, GRAY, (x + 23, y + 40, 12, 20))  # Right leg
+    
+    # Body (torn shirt)
+    pygame.draw.rect(surface, DARK_GREEN, (x + 8, y + 20, 24, 22))
+    
+    # Head (zombie green)
+    pygame.draw.circle(surface, ZOMBIE_GREEN, (center_x, y + 12), 12)
+    
+    # Eyes (dead/white)
+    pygame.draw.circle(surface, WHITE, (center_x - 4, y + 10), 3)
+    pygame.draw.circle(surface, WHITE, (center_x + 4, y + 10), 3)
+    pygame.draw.circle(surface, BLACK, (center_x - 4, y + 10), 1)
+    pygame.draw.circle(surface, BLACK, (center_x + 4, y + 10), 1)
+    
+    # Mouth (open/groaning)
+    pygame.draw.ellipse(surface, BLACK, (center_x - 4, y + 14, 8, 6))
+    
+    # Arms (reaching out)
+    pygame.draw.rect(surface, ZOMBIE_GREEN, (x - 2, y + 22, 8, 15))  # Left arm
+    pygame.draw.rect(surface, ZOMBIE_GREEN, (x + 34, y + 22, 8, 15))  # Right arm
+
+def draw_powerup_figure(surface, x, y, powerup_type):
+    """Draw a 30x30 powerup box with its top-left corner at (x, y)"""
+    if powerup_type == "speed":
+        # Speed powerup (lightning bolt)
+        pygame.draw.rect(surface, CYAN, (x, y, 30, 30))
+        pygame.draw.polygon(surface, YELLOW, [
+            (x + 15, y + 5),
+            (x + 10, y + 15),
+            (x + 18, y + 15),
+            (x + 12, y + 25)
+        ])
+        # Label
+        font = get_font(16)
+        surface.blit(font.render("2X", True, BLACK), (x + 8, y + 2))
+        
+    elif powerup_type == "invincible":
+        # Invincibility powerup (shield)
+        pygame.draw.rect(surface, PURPLE, (x, y, 30, 30))
+        pygame.draw.circle(surface, GOLD, (x + 15, y + 15), 12, 3)
+        # Label
+        font = get_font(16)
+        surface.blit(font.render("INV", True, WHITE), (x + 5, y + 10))
+
+def draw_particle_figure(surface, x, y, kind_name, step):
+    """Draw a particle centered on (x, y), shrunk for how far along its life it is"""
+    kind = PARTICLE_KINDS[PARTICLE_KIND_IDS[kind_name]]
+    radius = max(1, round(kind.radius * (PARTICLE_FADE_STEPS - step) / PARTICLE_FADE_STEPS))
+    pygame.draw.circle(surface, kind.color, (x, y), radius)
+
+# (width, height, offset_x, offset_y, draw) per sprite kind. A figure is drawn at
+# the offset inside its surface, so it blits at (entity.x - offset_x, entity.y - offset_y).
+SPRITE_LAYOUTS = {
+    "player": (50, 80, 0, 0, lambda surface, arms: draw_player_figure(surface, 0, 0, arms)),
+    "fist": (56, 56, 28, 28, lambda surface, bucket: FIST_SHAPE.draw(surface, 28, 28, bucket)),
+    "enemy": (44, 60, 2, 0, lambda surface, variant: draw_enemy_figure(surface, 2, 0)),
+    "powerup": (30, 30, 0, 0, lambda surface, powerup_type: draw_powerup_figure(
+        surface, 0, 0, powerup_type)),
+    "particle": (12, 12, 6, 6, lambda surface, variant: draw_particle_figure(surface, 6, 6, *variant)),
+}
+
+_sprite_cache = {}
+
+def get_sprite(kind, variant=None):
+    """Return (surface, (offset_x, offset_y)) for a figure, rendering it on first use.
+    
+    Figures in the loaded atlas are copied out of it instead of drawn.
+    """
+    key = (kind, variant)
+    sprite = _sprite_cache.get(key)
+    if sprite is None:
+        width, height, offset_x, offset_y, draw = SPRITE_LAYOUTS[kind]
+        if _atlas is not None and _atlas_key(kind, variant) in _atlas.sprites:
+            surface = _atlas.sprites[_atlas_key(kind, variant)]
+            if pygame.display.get_surface() is None:
+                surface = surface.copy()
+        else:
+            surface = pygame.Surface((width, height))
+            surface.fill(SPRITE_COLORKEY)
+            draw(surface, variant)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+        sprite = (surface, (offset_x, offset_y))
+        _sprite_cache[key] = sprite
+    return sprite
+
+def clear_render_caches():
+    """Drop cached fonts and sprites; they must not outlive pygame.quit()"""
+    _fonts.clear()
+    _sprite_cache.clear()
+
+# Atlas file: header, JSON index, then an RGB sprite sheet (SPRITE_COLORKEY
+# background) and an RGBA sheet of white glyphs, each 8-byte aligned
+ATLAS_MAGIC = b"ZPAT"
+ATLAS_VERSION = 1
+ATLAS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "punchgame.atlas")
+ATLAS_FONT_SIZES = (16, 24, 36)
+ATLAS_CHARACTERS = "".join(chr(code) for code in range(32, 127))
+_ATLAS_HEADER = struct.Struct("<4sHIIIII")  # magic, version, index size, sprite w/h, glyph w/h
+_ATLAS_WIDTH = 1024
+_atlas = None
+
+def _atlas_key(kind, variant):
+    return f"{kind}/{variant}"
+
+def _atlas_variants():
+    """Every sprite the game can ask for, as (kind, variant)"""
+    yield "player", True
+    yield "player", False
+    for bucket in range(FIST_SHAPE.buckets):
+        yield "fist", bucket
+    yield "enemy", None
+    for powerup_type in POWERUP_TYPES:
+        yield "powerup", powerup_type
+    for kind in PARTICLE_KINDS:
+        for step in range(PARTICLE_FADE_STEPS):
+            yield "particle", (kind.name, step)
+
+def _pack_shelves(sizes, width):
+    """Shelf-pack (w, h) boxes into rows `width` wide; returns positions and total height"""
+    positions = [None] * len(sizes)
+    x = y = row_height = 0
+    for index in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        box_width, box_height = sizes[index]
+        if x + box_width > width:
+            x = 0
+            y += row_height + 1
+            row_height = 0
+        positions[index] = (x, y)
+        x += box_width + 1
+        row_height = max(row_height, box_height)
+    return positions, y + row_height
+
+class AtlasFont:
+    """Font stand-in that lays out text from pre-rendered atlas glyphs.
+    
+    Glyphs are stored white and tinted per render, so one set serves every color,
+    and are laid out by their (fractional) advances without kerning pairs.
+    Anything the atlas can't serve (a background color, a character it lacks,
+    other Font methods) goes to a real Font, loaded only then.
+    """
+    def __init__(self, size, glyphs, advances, height, linesize):
+        self.size = size
+        self.glyphs = glyphs
+        self.advances = advances
+        self.height = height
+        self.linesize = linesize
+        self._font = None
+    
+    def font(self):
+        if self._font is None:
+            self._font = load_font(self.size)
+        return self._font
+    
+    def render(self, text, antialias, color, background=None):
+        glyphs = self.glyphs
+        if background is not None or not antialias or not all(char in glyphs for char in text):
+            return self.font().render(text, antialias, color, background)
+        positions = [round(x) for x in itertools.accumulate((self.advances[char] for char in text),
+                                                            initial=0)]
+        width = max([positions[-1]] + [x + glyphs[char].get_width() for char, x in zip(text, positions)])
+        surface = pygame.Surface((max(width, 1), self.height), pygame.SRCALPHA)
+        surface.blits([(glyphs[char], (x, 0), None, pygame.BLEND_RGBA_MAX)
+                       for char, x in zip(text, positions)], False)
+        surface.fill((*color[:3], 255), special_flags=pygame.BLEND_RGBA_MULT)
+        return surface
+    
+    def get_height(self):
+        return self.height
+    
+    def get_linesize(self):
+        return self.linesize
+    
+    def __getattr__(self, name):
+        return getattr(self.font(), name)
+
+class Atlas:
+    """Sprites and glyph fonts cut from a loaded atlas file's two sheets"""
+    def __init__(self, sprites, fonts):
+        self.sprites = sprites
+        self.fonts = fonts
+
+def build_atlas(path=ATLAS_PATH):
+    """Pre-render every sprite and the HUD glyphs into one atlas file"""
+    sprite_items = []
+    for kind, variant in _atlas_variants():
+        width, height, _, _, draw = SPRITE_LAYOUTS[kind]
+        surface = pygame.Surface((width, height))
+        surface.fill(SPRITE_COLORKEY)
+        draw(surface, variant)
+        sprite_items.append((_atlas_key(kind, variant), surface))
+    glyph_items = []
+    font_metrics = {}
+    for size in ATLAS_FONT_SIZES:
+        font = load_font(size)
+        font_metrics[size] = (font.get_height(), font.get_linesize())
+        for char in ATLAS_CHARACTERS:
+            # Font.metrics rounds advances; a run of the glyph recovers the fraction
+            advance = font.size(char * 16)[0] / 16
+            glyph_items.append(((size, char, advance), font.render(char, True, WHITE)))
+    
+    sprite_positions, sprite_height = _pack_shelves([item.get_size() for _, item in sprite_items],
+                                                    _ATLAS_WIDTH)
+    glyph_positions, glyph_height = _pack_shelves([item.get_size() for _, item in glyph_items],
+                                                  _ATLAS_WIDTH)
+    sprite_sheet = pygame.Surface((_ATLAS_WIDTH, max(sprite_height, 1)))
+    sprite_sheet.fill(SPRITE_COLORKEY)
+    index = {"sprites": {}, "fonts": {}}
+    for (key, surface), position in zip(sprite_items, sprite_positions):
+        sprite_sheet.blit(surface, position)
+        index["sprites"][key] = [*position, *surface.get_size()]
+    glyph_sheet = pygame.Surface((_ATLAS_WIDTH, max(glyph_height, 1)), pygame.SRCALPHA)
+    glyph_sheet.fill((0, 0, 0, 0))
+    for ((size, char, advance), surface), position in zip(glyph_items, glyph_positions):
+        glyph_sheet.blit(surface, position, special_flags=pygame.BLEND_RGBA_MAX)
+        font_index = index["fonts"].setdefault(str(size), {"height": font_metrics[size][0],
+                                                           "linesize": font_metrics[size][1],
+                                                           "glyphs": {}})
+        font_index["glyphs"][char] = [*position, *surface.get_size(), advance]
+    
+    index_bytes = json.dumps(index, separators=(",", ":")).encode()
+    header = _ATLAS_HEADER.pack(ATLAS_MAGIC, ATLAS_VERSION, len(index_bytes),
+                                *sprite_sheet.get_size(), *glyph_sheet.get_size())
+    parts = [header, index_bytes]
+    size = len(header) + len(index_bytes)
+    for sheet, pixel_format in ((sprite_sheet, "RGB"), (glyph_sheet, "RGBA")):
+        parts.append(bytes(_padded(size) - size))
+        pixels = pygame.image.tobytes(sheet, pixel_format)
+        parts.append(pixels)
+        size = _padded(size) + len(pixels)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(b"".join(parts))
+    os.replace(temp_path, path)
+
+def load_atlas(path=ATLAS_PATH):
+    """Load an atlas file for get_sprite and get_font; returns False if there is none.
+    
+    The file is memory-mapped (copy-on-write) where possible and the sheets are
+    surfaces over the mapping, so loading is one map with no decoding.
+    """
+    global _atlas
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return False
+    with f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            buffer = bytearray(f.read())
+    (magic, version, index_size, sprite_width, sprite_height, glyph_width,
+     glyph_height) = _ATLAS_HEADER.unpack_from(buffer)
+    if magic != ATLAS_MAGIC or version != ATLAS_VERSION:
+        raise ValueError(f"{path} is not a Zombie Puncher atlas (or an unsupported version)")
+    offset = _ATLAS_HEADER.size
+    index = json.loads(bytes(buffer[offset:offset + index_size]))
+    offset = _padded(offset + index_size)
+    view = memoryview(buffer)
+    sprite_bytes = sprite_width * sprite_height * 3
+    sprite_sheet = pygame.image.frombuffer(view[offset:offset + sprite_bytes],
+                                           (sprite_width, sprite_height), "RGB")
+    offset = _padded(offset + sprite_bytes)
+    glyph_sheet = pygame.image.frombuffer(view[offset:offset + glyph_width * glyph_height * 4],
+                                          (glyph_width, glyph_height), "RGBA")
+    
+    sprites = {key: sprite_sheet.subsurface(rect) for key, rect in index["sprites"].items()}
+    fonts = {}
+    for size, font_index in index["fonts"].items():
+        glyphs = {char: glyph_sheet.subsurface(entry[:4]) for char, entry in font_index["glyphs"].items()}
+        advances = {char: entry[4] for char, entry in font_index["glyphs"].items()}
+        fonts[int(size)] = AtlasFont(int(size), glyphs, advances, font_index["height"],
+                                     font_index["linesize"])
+    _atlas = Atlas(sprites, fonts)
+    _fonts.clear()
+    _sprite_cache.clear()
+    mark_startup("atlas loaded")
+    return True
+
 class Player:
     def __init__(self, x, y):
         self.x = x
         self.y = y
+        # Position at the start of the tick, for drawing between ticks
+        self.prev_x = x
+        self.prev_y = y
         self.width = 50
         self.height = 80
         self.speed = 5
@@ -37,11 +679,21 @@ class Player:
         self.punch_cooldown = 0
         self.base_punch_cooldown = 20
         self.punch_range = 80  # Increased punch radius
+        self.punch_hit_radius = 50  # Fist radius + tolerance for hit detection
+        self.punch_damage = 25
         self.is_punching = False
         self.punch_timer = 0
         self.punch_extension = 0  # How far the fist extends
-        self.hit_enemies = set()  # Track which enemies were hit in this punch
+        self.hit_enemies = set()  # uids of enemies hit in this punch
         self.punch_angle = 0  # Angle toward mouse when punch started
+        # Unit direction and fist sprite bucket of punch_angle, computed once per punch
+        self.punch_dir_x = 1.0
+        self.punch_dir_y = 0.0
+        self.punch_bucket = 0
+        # Optional TelemetryBus receiving this player's gameplay events
+        self.events = None
+        # Optional ParticleSystem showing this player's hits
+        self.effects = None
         
         # Powerup effects
         self.invincible = False
@@ -49,8 +701,9 @@ class Player:
         self.double_speed = False
         self.double_speed_timer = 0
         
-    def update(self, enemies):
-        keys = pygame.key.get_pressed()
+    def update(self, enemies, inputs, enemy_grid=None):
+        if inputs.punch:
+            self.punch(inputs.aim_x, inputs.aim_y)
         
         # Update powerup timers
         if self.invincible_timer > 0:
@@ -66,13 +719,13 @@ class Player:
             self.double_speed = False
         
         # Movement
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        if inputs.left:
             self.x -= self.speed
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if inputs.right:
             self.x += self.speed
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
+        if inputs.up:
             self.y -= self.speed
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
+        if inputs.down:
             self.y += self.speed
             
         # Keep player on screen
@@ -91,7 +744,7 @@ class Player:
             self.punch_extension = (10 - self.punch_timer) * 6
             
             # Check for hits during the entire punch animation
-            self.check_punch_hits(enemies)
+            self.check_punch_hits(enemies, enemy_grid)
         else:
             self.is_punching = False
             self.punch_extension = 0
@@ -102,75 +755,90 @@ class Player:
     def take_damage(self, damage):
         if not self.invincible:
             self.health -= damage
+            if self.events is not None:
+                self.events.emit("damage", damage, self.health)
     
     def activate_powerup(self, powerup_type):
+        if self.events is not None:
+            self.events.emit("powerup", powerup_type)
         if powerup_type == "speed":
             self.double_speed_timer = 300  # 5 seconds at 60 FPS
             self.base_punch_cooldown = 10
         elif powerup_type == "invincible":
             self.invincible_timer = 180  # 3 seconds at 60 FPS
     
-    def punch(self):
+    def punch(self, target_x, target_y):
         if self.punch_cooldown <= 0:
             self.punch_cooldown = self.base_punch_cooldown
             self.punch_timer = 10
             self.is_punching = True
             self.hit_enemies.clear()  # Clear previous hits
             
-            # Calculate angle to mouse
-            mouse_x, mouse_y = pygame.mouse.get_pos()
+            # Calculate angle to target
             player_center_x = self.x + self.width // 2
             player_center_y = self.y + self.height // 2
-            dx = mouse_x - player_center_x
-            dy = mouse_y - player_center_y
+            dx = target_x - player_center_x
+            dy = target_y - player_center_y
             self.punch_angle = math.atan2(dy, dx)
+            self.punch_dir_x = math.cos(self.punch_angle)
+            self.punch_dir_y = math.sin(self.punch_angle)
+            self.punch_bucket = FIST_SHAPE.bucket(self.punch_angle)
+            if self.events is not None:
+                self.events.emit("punch", self.punch_bucket)
     
-    def check_punch_hits(self, enemies):
-        """Check for collision with enemies during punch animation"""
+    def check_punch_hits(self, enemies, enemy_grid=None):
+        """Check for collision with enemies during punch animation.
+        
+        With an enemy_grid only enemies in cells near the fist are tested.
+        """
         if not self.is_punching:
             return
             
         # Get fist position (extends from player center in the direction of punch_angle)
         player_center_x = self.x + self.width // 2
         player_center_y = self.y + self.height // 2
-        fist_x = player_center_x + math.cos(self.punch_angle) * self.punch_extension
-        fist_y = player_center_y + math.sin(self.punch_angle) * self.punch_extension
+        fist_x = player_center_x + self.punch_dir_x * self.punch_extension
+        fist_y = player_center_y + self.punch_dir_y * self.punch_extension
+        
+        if isinstance(enemies, EnemyArrays):
+            hits, kills = enemies.punch_hits(fist_x, fist_y, self.punch_hit_radius,
+                                             self.punch_damage, self.hit_enemies)
+            if hits and self.events is not None:
+                self.events.emit("hit", hits, kills)
+            if hits and self.effects is not None:
+                self.effects.hit(fist_x, fist_y, self.punch_angle, hits)
+            return
+        
+        hit_radius_sq = self.punch_hit_radius * self.punch_hit_radius
+        if enemy_grid is not None:
+            enemies = enemy_grid.query(fist_x, fist_y, self.punch_hit_radius)
         
+        hits = 0
+        kills = 0
         for enemy in enemies:
-            if not enemy.alive or id(enemy) in self.hit_enemies:
+            if not enemy.alive or enemy.uid in self.hit_enemies:
                 continue
                 
             # Check if fist overlaps with enemy hitbox
             enemy_center_x = enemy.x + enemy.width // 2
             enemy_center_y = enemy.y + enemy.height // 2
             
-            distance = math.sqrt((fist_x - enemy_center_x)**2 + (fist_y - enemy_center_y)**2)
+            dx = fist_x - enemy_center_x
+            dy = fist_y - enemy_center_y
             
             # Hit detection with fist size consideration (bigger radius)
-            if distance < 50:  # Increased fist radius + tolerance
-                enemy.take_damage(25)
-                self.hit_enemies.add(id(enemy))  # Mark this enemy as hit
-    
-    def rotate_point(self, x, y, cx, cy, angle):
-        """Rotate a point (x, y) around center (cx, cy) by angle"""
-        s = math.sin(angle)
-        c = math.cos(angle)
-        
-        # Translate point to origin
-        x -= cx
-        y -= cy
-        
-        # Rotate
-        new_x = x * c - y * s
-        new_y = x * s + y * c
-        
-        # Translate back
-        return new_x + cx, new_y + cy
+            if dx * dx + dy * dy < hit_radius_sq:
+                enemy.take_damage(self.punch_damage)
+                self.hit_enemies.add(enemy.uid)  # Mark this enemy as hit
+                hits += 1
+                kills += not enemy.alive
+        if hits and self.events is not None:
+            self.events.emit("hit", hits, kills)
+        if hits and self.effects is not None:
+            self.effects.hit(fist_x, fist_y, self.punch_angle, hits)
     
     def draw(self, screen):
-        # Draw human player
-        center_x = self.x + self.width // 2
-        
+        """Draw the player and return the screen area it covers"""
         # Invincibility effect - glowing outline
         if self.invincible:
             pygame.draw.rect(screen, GOLD, (self.x - 3, self.y - 3, self.width + 6, self.height + 6), 3)
@@ -179,27 +847,11 @@ class Player:
         if self.double_speed:
             pygame.draw.rect(screen, CYAN, (self.x - 2, self.y - 2, self.width + 4, self.height + 4), 2)
         
-        # Legs
-        pygame.draw.rect(screen, BLUE, (self.x + 5, self.y + 50, 15, 30))  # Left leg
-        pygame.draw.rect(screen, BLUE, (self.x + 30, self.y + 50, 15, 30))  # Right leg
-        
-        # Body (torso)
-        pygame.draw.rect(screen, RED, (self.x + 10, self.y + 25, 30, 30))
-        
-        # Head
-        pygame.draw.circle(screen, SKIN_TONE, (center_x, self.y + 15), 15)
-        
-        # Eyes
-        pygame.draw.circle(screen, BLACK, (center_x - 5, self.y + 12), 3)
-        pygame.draw.circle(screen, BLACK, (center_x + 5, self.y + 12), 3)
-        
-        # Mouth
-        pygame.draw.arc(screen, BLACK, (center_x - 6, self.y + 15, 12, 8), 3.14, 6.28, 2)
-        
-        # Arms (when not punching)
-        if not self.is_punching:
-            pygame.draw.rect(screen, SKIN_TONE, (self.x, self.y + 30, 10, 20))  # Left arm
-            pygame.draw.rect(screen, SKIN_TONE, (self.x + 40, self.y + 30, 10, 20))  # Right arm
+        # Human player, with arms at the sides unless punching
+        sprite, (offset_x, offset_y) = get_sprite("player", not self.is_punching)
+        screen.blit(sprite, (self.x - offset_x, self.y - offset_y))
+        # Outlines, figure and health bar
+        rect = pygame.Rect(self.x - 5, self.y - 15, self.width + 10, self.height + 18)
         
         # Draw punch effect - human fist
         if self.is_punching:
@@ -207,72 +859,26 @@ class Player:
             player_center_y = self.y + self.height // 2
             
             # Calculate fist position based on angle
-            fist_x = player_center_x + math.cos(self.punch_angle) * self.punch_extension
-            fist_y = player_center_y + math.sin(self.punch_angle) * self.punch_extension
-            
-            # Skin tone color
-            SKIN_SHADOW = (220, 180, 140)
+            dir_x = self.punch_dir_x
+            dir_y = self.punch_dir_y
+            fist_x = player_center_x + dir_x * self.punch_extension
+            fist_y = player_center_y + dir_y * self.punch_extension
             
             # Draw arm extending from player to fist
             arm_width = 15
             arm_length = 20
-            arm_start_x = player_center_x + math.cos(self.punch_angle) * 25
-            arm_start_y = player_center_y + math.sin(self.punch_angle) * 25
-            arm_end_x = fist_x - math.cos(self.punch_angle) * arm_length
-            arm_end_y = fist_y - math.sin(self.punch_angle) * arm_length
-            pygame.draw.line(screen, SKIN_TONE, 
-                           (arm_start_x, arm_start_y), 
-                           (arm_end_x, arm_end_y), arm_width)
-            
-            # Define fist shape relative to origin (pointing right)
-            # Main fist body (knuckles)
-            base_fist_points = [
-                (-10, -15),  # Top left
-                (15, -15),   # Top right
-                (20, -5),    # Right knuckle
-                (20, 10),    # Bottom right
-                (-10, 10),   # Bottom left
-                (-15, 0)     # Left side
-            ]
-            
-            # Rotate and translate fist points
-            fist_points = []
-            for px, py in base_fist_points:
-                rotated_x, rotated_y = self.rotate_point(px, py, 0, 0, self.punch_angle)
-                fist_points.append((fist_x + rotated_x, fist_y + rotated_y))
-            
-            pygame.draw.polygon(screen, SKIN_TONE, fist_points)
-            pygame.draw.polygon(screen, SKIN_SHADOW, fist_points, 2)
+            arm_start_x = player_center_x + dir_x * 25
+            arm_start_y = player_center_y + dir_y * 25
+            arm_end_x = fist_x - dir_x * arm_length
+            arm_end_y = fist_y - dir_y * arm_length
+            arm_rect = pygame.draw.line(screen, SKIN_TONE, 
+                                        (arm_start_x, arm_start_y), 
+                                        (arm_end_x, arm_end_y), arm_width)
             
-            # Draw thumb
-            base_thumb_points = [
-                (-10, -5),
-                (-18, -8),
-                (-18, 5),
-                (-10, 8)
-            ]
-            
-            thumb_points = []
-            for px, py in base_thumb_points:
-                rotated_x, rotated_y = self.rotate_point(px, py, 0, 0, self.punch_angle)
-                thumb_points.append((fist_x + rotated_x, fist_y + rotated_y))
-            
-            pygame.draw.polygon(screen, SKIN_TONE, thumb_points)
-            pygame.draw.polygon(screen, SKIN_SHADOW, thumb_points, 2)
-            
-            # Draw knuckle details (small lines)
-            for i in range(3):
-                base_x1 = 5 + i * 5
-                base_y1 = -15
-                base_x2 = 5 + i * 5
-                base_y2 = -10
-                
-                x1, y1 = self.rotate_point(base_x1, base_y1, 0, 0, self.punch_angle)
-                x2, y2 = self.rotate_point(base_x2, base_y2, 0, 0, self.punch_angle)
-                
-                pygame.draw.line(screen, SKIN_SHADOW, 
-                               (fist_x + x1, fist_y + y1), 
-                               (fist_x + x2, fist_y + y2), 2)
+            fist, (offset_x, offset_y) = get_sprite("fist", self.punch_bucket)
+            fist_rect = screen.blit(fist, (fist_x - offset_x, fist_y - offset_y))
+            rect.union_ip(arm_rect)
+            rect.union_ip(fist_rect)
         
         # Draw health bar
         bar_width = 60
@@ -280,34 +886,96 @@ class Player:
         health_ratio = self.health / self.max_health
         pygame.draw.rect(screen, RED, (self.x - 5, self.y - 15, bar_width, bar_height))
         pygame.draw.rect(screen, GREEN, (self.x - 5, self.y - 15, bar_width * health_ratio, bar_height))
+        return rect
+
+class EnemyType:
+    """Stats for one kind of enemy; speed_scale multiplies Game.enemy_speed"""
+    def __init__(self, name, speed_scale=1.0, health=50):
+        self.name = name
+        self.speed_scale = speed_scale
+        self.health = health
+
+ENEMY_TYPES = {enemy_type.name: enemy_type for enemy_type in [
+    EnemyType("walker"),
+    EnemyType("runner", speed_scale=1.75, health=25),
+    EnemyType("brute", speed_scale=0.6, health=150),
+]}
+
+class ParticleKind:
+    """Look and motion of one kind of particle effect.
+    
+    Each emit gives `count` particles per origin, launched within `spread` radians
+    of the emit angle at up to `speed` pixels per tick; every tick velocity is
+    multiplied by drag and gravity is added to it, for up to `life` ticks.
+    """
+    def __init__(self, name, color, radius, life, speed, count, spread=math.pi, gravity=0.0,
+                 drag=1.0):
+        self.name = name
+        self.color = color
+        self.radius = radius
+        self.life = life
+        self.speed = speed
+        self.count = count
+        self.spread = spread
+        self.gravity = gravity
+        self.drag = drag
+
+PARTICLE_KINDS = (
+    ParticleKind("blood", (150, 0, 0), radius=3, life=40, speed=5, count=8, spread=0.7,
+                 gravity=0.2, drag=0.88),
+    ParticleKind("spark", YELLOW, radius=2, life=12, speed=6, count=6, drag=0.8),
+    ParticleKind("puff", (170, 190, 150), radius=5, life=30, speed=1.5, count=10, gravity=-0.05,
+                 drag=0.94),
+    ParticleKind("pickup_speed", CYAN, radius=3, life=25, speed=3, count=16, drag=0.92),
+    ParticleKind("pickup_invincible", GOLD, radius=3, life=25, speed=3, count=16, drag=0.92),
+)
+PARTICLE_KIND_IDS = {kind.name: index for index, kind in enumerate(PARTICLE_KINDS)}
+# Particles shrink through this many pre-rendered sizes as they age
+PARTICLE_FADE_STEPS = 4
 
 class Enemy:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+    def __init__(self, x, y, uid=0):
         self.width = 40
         self.height = 60
         self.speed = 2
-        self.health = 50
         self.max_health = 50
+        self.reset(x, y, uid)
+    
+    def reset(self, x, y, uid=0):
+        """(Re)spawn this enemy at (x, y) with full health.
+        
+        uid must be unique per spawn in its game, so a recycled instance never
+        inherits punch hit tracking; Game numbers its spawns from 0 like EnemyArrays.
+        """
+        self.uid = uid
+        self.x = x
+        self.y = y
+        self.prev_x = x
+        self.prev_y = y
+        self.health = self.max_health
         self.attack_cooldown = 0
         self.alive = True
         
-    def update(self, player):
+    def update(self, player, flow_field=None):
         if not self.alive:
             return
             
-        # Move towards player
+        # Move towards player, following the flow field where it has a direction
         dx = player.x - self.x
         dy = player.y - self.y
-        distance = math.sqrt(dx**2 + dy**2)
+        distance_sq = dx * dx + dy * dy
         
-        if distance > 0:
+        direction = flow_field.direction(self.x, self.y) if flow_field is not None else None
+        if direction is not None:
+            self.x += direction[0] * self.speed
+            self.y += direction[1] * self.speed
+        elif distance_sq > 0:
+            distance = math.sqrt(distance_sq)
             self.x += (dx / distance) * self.speed
             self.y += (dy / distance) * self.speed
         
         # Attack player if close
-        if distance < 40 and self.attack_cooldown <= 0:
+        if distance_sq < 40 * 40 and self.attack_cooldown <= 0:
             player.take_damage(10)
             self.attack_cooldown = 60
             
@@ -320,48 +988,583 @@ class Enemy:
             self.alive = False
     
     def draw(self, screen):
+        """Draw the zombie and return the screen area it covers"""
         if not self.alive:
-            return
+            return None
+        
+        sprite, (offset_x, offset_y) = get_sprite("enemy")
+        rect = screen.blit(sprite, (self.x - offset_x, self.y - offset_y))
+        return rect.union(self.draw_health_bar(screen))
+    
+    def draw_health_bar(self, screen):
+        bar_width = 50
+        bar_height = 6
+        health_ratio = self.health / self.max_health
+        rect = pygame.draw.rect(screen, BLACK, (self.x - 5, self.y - 12, bar_width, bar_height))
+        pygame.draw.rect(screen, GREEN, (self.x - 5, self.y - 12, bar_width * health_ratio, bar_height))
+        return rect
+
+def _array_field(name):
+    """Property reading and writing one slot of an EnemyArrays column"""
+    def get(self):
+        return getattr(self.population, name)[self.index].item()
+    
+    def set(self, value):
+        getattr(self.population, name)[self.index] = value
+    
+    return property(get, set)
+
+class EnemyView(Enemy):
+    """Enemy-compatible view of one slot in an EnemyArrays population.
+    
+    Views are only valid until the population next compacts (the end of its update).
+    """
+    x = _array_field("x")
+    y = _array_field("y")
+    health = _array_field("health")
+    alive = _array_field("alive")
+    attack_cooldown = _array_field("attack_cooldown")
+    uid = _array_field("uid")
+    speed = _array_field("speed")
+    max_health = _array_field("max_health")
+    
+    def __init__(self, population, index):
+        self.population = population
+        self.index = index
+        self.width = population.width
+        self.height = population.height
+
+class EnemyArrays:
+    """Structure-of-arrays enemy population stored in contiguous NumPy arrays.
+    
+    Chase movement, cooldowns, attacks and death culling each run as a single
+    vectorized pass per tick instead of a Python loop over Enemy objects.
+    Iterating yields EnemyView objects for code that expects Enemy instances.
+    """
+    FIELDS = ("x", "y", "health", "alive", "attack_cooldown", "uid", "speed", "max_health",
+              "prev_x", "prev_y")
+    
+    def __init__(self, capacity=1024):
+        if np is None:
+            raise RuntimeError("EnemyArrays needs numpy installed")
+        # Shared by every enemy, same values as Enemy.__init__
+        self.width = 40
+        self.height = 60
+        self.count = 0
+        self.next_uid = 0
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.health = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.attack_cooldown = np.zeros(capacity, dtype=np.int32)
+        self.uid = np.zeros(capacity, dtype=np.int64)  # Stable identity for punch hit tracking
+        self.speed = np.zeros(capacity, dtype=np.float64)
+        self.max_health = np.zeros(capacity, dtype=np.int32)
+        # Positions at the start of the tick, for drawing between ticks
+        self.prev_x = np.zeros(capacity, dtype=np.float64)
+        self.prev_y = np.zeros(capacity, dtype=np.float64)
+    
+    def __len__(self):
+        return self.count
+    
+    def __iter__(self):
+        for index in range(self.count):
+            yield EnemyView(self, index)
+    
+    def _grow(self, needed):
+        capacity = max(len(self.x), 1)
+        while capacity < needed:
+            capacity *= 2
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+    
+    def spawn(self, x, y, speed=2, max_health=50):
+        if self.count == len(self.x):
+            self._grow(self.count + 1)
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.health[i] = max_health
+        self.alive[i] = True
+        self.attack_cooldown[i] = 0
+        self.uid[i] = self.next_uid
+        self.speed[i] = speed
+        self.max_health[i] = max_health
+        self.prev_x[i] = x
+        self.prev_y[i] = y
+        self.next_uid += 1
+        self.count += 1
+    
+    def spawn_many(self, x, y, speed=2, max_health=50):
+        """Append a batch of enemies at positions x, y (sequences of equal length) in one pass"""
+        x = np.asarray(x, dtype=np.float64)
+        added = len(x)
+        start = self.count
+        end = start + added
+        if end > len(self.x):
+            self._grow(end)
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.health[start:end] = max_health
+        self.alive[start:end] = True
+        self.attack_cooldown[start:end] = 0
+        self.uid[start:end] = np.arange(self.next_uid, self.next_uid + added)
+        self.speed[start:end] = speed
+        self.max_health[start:end] = max_health
+        self.prev_x[start:end] = x
+        self.prev_y[start:end] = y
+        self.next_uid += added
+        self.count = end
+    
+    def draw(self, screen, rects=False):
+        """Draw every live enemy and its health bar straight from the columns.
         
-        center_x = self.x + self.width // 2
+        Same pixels as Enemy.draw_health_bar plus the batched sprite blit, without
+        an EnemyView per enemy. Returns the covered areas when rects is true.
+        """
+        n = self.count
+        alive = self.alive[:n]
+        xs = self.x[:n][alive].tolist()
+        ys = self.y[:n][alive].tolist()
+        ratios = (self.health[:n][alive] / self.max_health[:n][alive]).tolist()
+        sprite, (offset_x, offset_y) = get_sprite("enemy")
+        dirty = screen.blits([(sprite, (x - offset_x, y - offset_y)) for x, y in zip(xs, ys)],
+                             rects) or []
+        draw_rect = pygame.draw.rect
+        for x, y, ratio in zip(xs, ys, ratios):
+            rect = draw_rect(screen, BLACK, (x - 5, y - 12, 50, 6))
+            draw_rect(screen, GREEN, (x - 5, y - 12, 50 * ratio, 6))
+            if rects:
+                dirty.append(rect)
+        return dirty
+    
+    def punch_hits(self, fist_x, fist_y, radius, damage, hit_uids):
+        """Damage every live enemy whose center is within radius of the fist.
         
-        # Draw zombie
-        # Legs (torn pants)
-        pygame.draw.rect(screen, GRAY, (self.x + 5, self.y + 40, 12, 20))  # Left leg
-        pygame.draw.rect(screen, GRAY, (self.x + 23, self.y + 40, 12, 20))  # Right leg
+        Enemies whose uid is already in hit_uids are skipped; new hits are added.
+        Returns (enemies hit, enemies killed).
+        """
+        n = self.count
+        dx = fist_x - (self.x[:n] + self.width // 2)
+        dy = fist_y - (self.y[:n] + self.height // 2)
+        hits = (dx * dx + dy * dy < radius * radius) & self.alive[:n]
+        if hit_uids:
+            hits &= ~np.isin(self.uid[:n], np.fromiter(hit_uids, dtype=np.int64))
+        hit_index = np.flatnonzero(hits)
+        if len(hit_index) == 0:
+            return 0, 0
+        self.health[hit_index] -= damage
+        survived = self.health[hit_index] > 0
+        self.alive[hit_index] = survived
+        hit_uids.update(self.uid[hit_index].tolist())
+        return len(hit_index), len(hit_index) - int(np.count_nonzero(survived))
+    
+    def update(self, player, flow_field=None):
+        """Advance every enemy one tick, then drop the dead. Returns the number removed."""
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        alive = self.alive[:n]
+        cooldown = self.attack_cooldown[:n]
+        speed = self.speed[:n]
         
-        # Body (torn shirt)
-        pygame.draw.rect(screen, DARK_GREEN, (self.x + 8, self.y + 20, 24, 22))
+        # Move towards player
+        dx = player.x - x
+        dy = player.y - y
+        distance_sq = dx * dx + dy * dy
+        moving = alive & (distance_sq > 0)
+        distance = np.sqrt(distance_sq, where=moving, out=np.ones(n))
+        # Same operation order as Enemy.update, so both backends round identically
+        move_x = np.where(moving, dx / distance * speed, 0.0)
+        move_y = np.where(moving, dy / distance * speed, 0.0)
+        if flow_field is not None:
+            # Follow the flow field where it has a direction, chase directly elsewhere
+            flow_x, flow_y = flow_field.directions(x, y)
+            guided = alive & ((flow_x != 0) | (flow_y != 0))
+            move_x = np.where(guided, flow_x * speed, move_x)
+            move_y = np.where(guided, flow_y * speed, move_y)
+        x += move_x
+        y += move_y
         
-        # Head (zombie green)
-        pygame.draw.circle(screen, ZOMBIE_GREEN, (center_x, self.y + 12), 12)
+        # Attack player if close
+        attacking = alive & (distance_sq < 40 * 40) & (cooldown <= 0)
+        attacks = int(np.count_nonzero(attacking))
+        for _ in range(attacks):
+            player.take_damage(10)
+        cooldown[attacking] = 60
+        cooldown[alive & (cooldown > 0)] -= 1
         
-        # Eyes (dead/white)
-        pygame.draw.circle(screen, WHITE, (center_x - 4, self.y + 10), 3)
-        pygame.draw.circle(screen, WHITE, (center_x + 4, self.y + 10), 3)
-        pygame.draw.circle(screen, BLACK, (center_x - 4, self.y + 10), 1)
-        pygame.draw.circle(screen, BLACK, (center_x + 4, self.y + 10), 1)
+        # Compact the survivors to the front of every array in one pass
+        if alive.all():
+            return 0
+        keep = np.flatnonzero(alive)
+        for name in self.FIELDS:
+            column = getattr(self, name)
+            column[:len(keep)] = column[keep]
+        self.count = len(keep)
+        return n - self.count
+
+# Golden angle, used to spread enemies that sit exactly on top of each other
+_GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+class Separation:
+    """Crowd steering that pushes enemies apart so a horde spreads out instead of stacking.
+    
+    Enemies are binned into cells `radius` wide, each summarized by its count and
+    centroid. A cell is pushed away from the centroids of the eight cells around
+    it, and each enemy away from the centroid of the rest of its own cell, weighted
+    by closeness and crowding (capped at max_crowd); the sum moves the enemy by up
+    to strength times its own speed. Neighbor work is per cell rather than per
+    enemy, so a dense horde gets cheaper, not quadratically dearer.
+    """
+    def __init__(self, radius=30, strength=1.0, max_crowd=8):
+        self.radius = radius
+        self.strength = strength
+        self.max_crowd = max_crowd
+    
+    def steer(self, enemies):
+        """Apply one tick of separation to an EnemyArrays or a pool of Enemy objects"""
+        if isinstance(enemies, EnemyArrays):
+            self._steer_arrays(enemies)
+        else:
+            self._steer_objects(enemies)
+    
+    def _steer_arrays(self, enemies):
+        # Only the living take part, as in _steer_objects: enemies punched dead this
+        # tick are still in the columns until EnemyArrays.update compacts them
+        n = enemies.count
+        live = np.flatnonzero(enemies.alive[:n])
+        if len(live) < 2:
+            return
+        x = enemies.x[live]
+        y = enemies.y[live]
+        radius = self.radius
+        reach = radius * 1.5  # Centroids of diagonal neighbors can be this far apart
+        # floor_divide and sqrt(dx * dx + dy * dy) round exactly like // and the
+        # formula in _steer_objects, so both backends move enemies identically
+        keys = ((np.floor_divide(x, radius).astype(np.int64) << 32)
+                + np.floor_divide(y, radius).astype(np.int64))
+        cell_keys, cell_of = np.unique(keys, return_inverse=True)
+        count = np.bincount(cell_of)
+        sum_x = np.bincount(cell_of, x)
+        sum_y = np.bincount(cell_of, y)
+        center_x = sum_x / count
+        center_y = sum_y / count
+        crowd = np.minimum(count, self.max_crowd)
         
-        # Mouth (open/groaning)
-        pygame.draw.ellipse(screen, BLACK, (center_x - 4, self.y + 14, 8, 6))
+        # Push every cell away from the crowded cells around it
+        cell_push_x = np.zeros(len(cell_keys))
+        cell_push_y = np.zeros(len(cell_keys))
+        for cell_dx in (-1, 0, 1):
+            for cell_dy in (-1, 0, 1):
+                if cell_dx == 0 and cell_dy == 0:
+                    continue
+                target = cell_keys + (cell_dx << 32) + cell_dy
+                neighbor = np.minimum(np.searchsorted(cell_keys, target), len(cell_keys) - 1)
+                dx = center_x - center_x[neighbor]
+                dy = center_y - center_y[neighbor]
+                distance = np.sqrt(dx * dx + dy * dy)
+                near = (cell_keys[neighbor] == target) & (distance < reach) & (distance > 0)
+                weight = np.where(near, (1 - distance / reach) * crowd[neighbor]
+                                  / np.maximum(distance, 1e-9), 0.0)
+                cell_push_x += dx * weight
+                cell_push_y += dy * weight
         
-        # Arms (reaching out)
-        pygame.draw.rect(screen, ZOMBIE_GREEN, (self.x - 2, self.y + 22, 8, 15))  # Left arm
-        pygame.draw.rect(screen, ZOMBIE_GREEN, (self.x + 34, self.y + 22, 8, 15))  # Right arm
+        # Then every enemy away from the rest of its own cell
+        others = count[cell_of] - 1
+        divisor = np.maximum(others, 1)
+        dx = x - (sum_x[cell_of] - x) / divisor
+        dy = y - (sum_y[cell_of] - y) / divisor
+        distance = np.sqrt(dx * dx + dy * dy)
+        # Enemies sitting exactly on that centroid get a fixed direction from their uid
+        stacked = (others > 0) & (distance == 0)
+        if stacked.any():
+            angle = enemies.uid[live][stacked] * _GOLDEN_ANGLE
+            dx[stacked] = np.cos(angle)
+            dy[stacked] = np.sin(angle)
+            distance[stacked] = 1.0
+        weight = np.where((others > 0) & (distance < reach),
+                          (1 - distance / reach) * np.minimum(others, self.max_crowd)
+                          / np.maximum(distance, 1e-9), 0.0)
+        push_x = cell_push_x[cell_of] + dx * weight
+        push_y = cell_push_y[cell_of] + dy * weight
         
-        # Draw health bar
-        bar_width = 50
-        bar_height = 6
-        health_ratio = self.health / self.max_health
-        pygame.draw.rect(screen, BLACK, (self.x - 5, self.y - 12, bar_width, bar_height))
-        pygame.draw.rect(screen, GREEN, (self.x - 5, self.y - 12, bar_width * health_ratio, bar_height))
+        limit = self.strength * enemies.speed[live]
+        length = np.sqrt(push_x * push_x + push_y * push_y)
+        scale = limit * np.minimum(1.0, 1.0 / np.maximum(length, 1e-9))
+        enemies.x[live] = x + push_x * scale
+        enemies.y[live] = y + push_y * scale
+    
+    def _steer_objects(self, enemies):
+        radius = self.radius
+        reach = radius * 1.5
+        max_crowd = self.max_crowd
+        living = [enemy for enemy in enemies if enemy.alive]
+        cells = {}
+        for enemy in living:
+            key = (int(enemy.x // radius), int(enemy.y // radius))
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [1, enemy.x, enemy.y]
+            else:
+                cell[0] += 1
+                cell[1] += enemy.x
+                cell[2] += enemy.y
+        
+        # Push every cell away from the crowded cells around it
+        cell_pushes = {}
+        for (cell_x, cell_y), (count, sum_x, sum_y) in cells.items():
+            center_x = sum_x / count
+            center_y = sum_y / count
+            push_x = 0.0
+            push_y = 0.0
+            for cell_dx in (-1, 0, 1):
+                for cell_dy in (-1, 0, 1):
+                    neighbor = cells.get((cell_x + cell_dx, cell_y + cell_dy))
+                    if neighbor is None or (cell_dx == 0 and cell_dy == 0):
+                        continue
+                    dx = center_x - neighbor[1] / neighbor[0]
+                    dy = center_y - neighbor[2] / neighbor[0]
+                    distance = math.sqrt(dx * dx + dy * dy)
+                    if 0 < distance < reach:
+                        weight = (1 - distance / reach) * min(neighbor[0], max_crowd) / distance
+                        push_x += dx * weight
+                        push_y += dy * weight
+            cell_pushes[cell_x, cell_y] = (push_x, push_y)
+        
+        # Then every enemy away from the rest of its own cell
+        moves = []
+        for enemy in living:
+            key = (int(enemy.x // radius), int(enemy.y // radius))
+            push_x, push_y = cell_pushes[key]
+            count, sum_x, sum_y = cells[key]
+            others = count - 1
+            if others:
+                dx = enemy.x - (sum_x - enemy.x) / others
+                dy = enemy.y - (sum_y - enemy.y) / others
+                distance = math.sqrt(dx * dx + dy * dy)
+                if distance == 0:
+                    # Sitting exactly on that centroid; take a fixed direction from the uid
+                    angle = enemy.uid * _GOLDEN_ANGLE
+                    dx = math.cos(angle)
+                    dy = math.sin(angle)
+                    distance = 1.0
+                if distance < reach:
+                    weight = (1 - distance / reach) * min(others, max_crowd) / distance
+                    push_x += dx * weight
+                    push_y += dy * weight
+            if push_x or push_y:
+                moves.append((enemy, push_x, push_y))
+        # Apply after measuring everyone, so the result doesn't depend on iteration order
+        for enemy, push_x, push_y in moves:
+            limit = self.strength * enemy.speed
+            scale = limit * min(1.0, 1.0 / math.sqrt(push_x * push_x + push_y * push_y))
+            enemy.x += push_x * scale
+            enemy.y += push_y * scale
+
+# Flow field neighbor steps (column, row) and their costs; diagonals cost sqrt(2)
+_FLOW_STEPS = [(dc, dr, math.hypot(dc, dr)) for dc in (-1, 0, 1) for dr in (-1, 0, 1) if dc or dr]
+
+class FlowField:
+    """Grid of directions leading every enemy to the player, shared by the whole horde.
+    
+    A Dijkstra search from the player's cell gives every cell its distance to the
+    player around blocked cells, and each cell points at its closest neighbor, so
+    steering costs an enemy one lookup however large the horde is. A new search
+    starts when the player moves to another cell (at most once every min_interval
+    ticks) or the obstacles change, and runs search_budget queue pops per tick, by
+    default enough to finish within min_interval ticks; enemies keep following the
+    previous field until it completes. Enemies in the player's cell, off the grid
+    or cut off from the player chase directly, as without a field. The grid covers
+    the screen plus `margin` on every side for spawning enemies.
+    """
+    def __init__(self, cell_size=32, margin=160, min_interval=4, search_budget=None):
+        if np is None:
+            raise RuntimeError("FlowField needs numpy installed")
+        self.cell_size = cell_size
+        self.margin = margin
+        self.min_interval = min_interval
+        self.cols = (SCREEN_WIDTH + 2 * margin) // cell_size + 1
+        self.rows = (SCREEN_HEIGHT + 2 * margin) // cell_size + 1
+        size = self.cols * self.rows
+        if search_budget is None:
+            search_budget = -(-size // max(min_interval, 1))
+        self.search_budget = search_budget
+        self.blocked = [False] * size
+        self.distance = [math.inf] * size
+        self.dir_x = [0.0] * size
+        self.dir_y = [0.0] * size
+        self.target = None
+        self.built_tick = None
+        self.dirty = True
+        self.builds = 0
+        # Search in progress as (target, distances, queue), or None
+        self.search = None
+        # Passable moves out of each cell as (neighbor, cost) lists, rebuilt when obstacles change
+        self._edges = None
+        # Per _FLOW_STEPS entry: neighbor index of each cell (size for off the grid) and unit step
+        index = np.arange(size)
+        row, col = np.divmod(index, self.cols)
+        neighbors = []
+        for dc, dr, _ in _FLOW_STEPS:
+            inside = (col + dc >= 0) & (col + dc < self.cols) & (row + dr >= 0) & (row + dr < self.rows)
+            neighbors.append(np.where(inside, index + dr * self.cols + dc, size))
+        self._neighbors = np.array(neighbors)
+        self._step_cost = np.array([step for _, _, step in _FLOW_STEPS])[:, None]
+        self._step_x = np.array([dc / step for dc, _, step in _FLOW_STEPS] + [0.0])
+        self._step_y = np.array([dr / step for _, dr, step in _FLOW_STEPS] + [0.0])
+        # dir_x and dir_y as arrays for directions(), with an off-grid slot at the end
+        self._arrays = (np.zeros(size + 1), np.zeros(size + 1))
+    
+    def cell(self, x, y):
+        """Index of the cell containing (x, y), or None off the grid"""
+        col = int((x + self.margin) // self.cell_size)
+        row = int((y + self.margin) // self.cell_size)
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return row * self.cols + col
+        return None
+    
+    def set_blocked(self, rect, blocked=True):
+        """Mark every cell overlapping a pygame Rect (or x, y, w, h) as impassable"""
+        x, y, width, height = rect
+        size = self.cell_size
+        first_col = max(int((x + self.margin) // size), 0)
+        last_col = min(int((x + width - 1 + self.margin) // size), self.cols - 1)
+        first_row = max(int((y + self.margin) // size), 0)
+        last_row = min(int((y + height - 1 + self.margin) // size), self.rows - 1)
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                self.blocked[row * self.cols + col] = blocked
+        self.dirty = True
+        self._edges = None
+    
+    def update(self, target_x, target_y, tick):
+        """Start a search toward (target_x, target_y) if it changed cell and the throttle
+        allows (or the obstacles changed), and advance the search in progress"""
+        target = self.cell(target_x, target_y)
+        heading = self.search[0] if self.search is not None else self.target
+        if self.dirty or (target != heading and (self.built_tick is None
+                                                 or tick - self.built_tick >= self.min_interval)):
+            self.start(target)
+            self.built_tick = tick
+        if self.search is not None:
+            self.advance(self.search_budget)
+    
+    def build(self, target):
+        """Recompute distances and directions toward the target cell in one go"""
+        self.start(target)
+        self.advance(None)
+    
+    def start(self, target):
+        """Begin a Dijkstra search toward the target cell, replacing any in progress"""
+        self.dirty = False
+        distance = [math.inf] * (self.cols * self.rows)
+        queue = []
+        if target is not None:
+            distance[target] = 0.0
+            queue.append((0.0, target))
+        self.search = (target, distance, queue)
+    
+    def advance(self, budget):
+        """Pop up to `budget` cells (None for all) off the search queue, installing the
+        finished field when the queue runs dry"""
+        target, distance, queue = self.search
+        edges = self._edges
+        if edges is None:
+            edges = self._edges = self._passable_edges()
+        pops = 0
+        while queue and (budget is None or pops < budget):
+            cost, index = heapq.heappop(queue)
+            pops += 1
+            if cost > distance[index]:
+                continue
+            for neighbor, step in edges[index]:
+                new_cost = cost + step
+                if new_cost < distance[neighbor]:
+                    distance[neighbor] = new_cost
+                    heapq.heappush(queue, (new_cost, neighbor))
+        if not queue:
+            self.search = None
+            self.install(target, distance)
+    
+    def _passable_edges(self):
+        """Moves out of every cell that avoid blocked cells, as (neighbor, cost) lists"""
+        cols = self.cols
+        rows = self.rows
+        blocked = self.blocked
+        edges = []
+        for index in range(cols * rows):
+            row, col = divmod(index, cols)
+            moves = []
+            for dc, dr, step in _FLOW_STEPS:
+                c = col + dc
+                r = row + dr
+                if not (0 <= c < cols and 0 <= r < rows):
+                    continue
+                neighbor = r * cols + c
+                # No squeezing diagonally between two blocked cells
+                if blocked[neighbor] or (dc and dr and (blocked[row * cols + c]
+                                                        or blocked[r * cols + col])):
+                    continue
+                moves.append((neighbor, step))
+            edges.append(moves)
+        return edges
+    
+    def install(self, target, distance):
+        """Point every reachable cell at its closest neighbor (toward the target).
+        
+        Ties go to the last of the closest neighbors in _FLOW_STEPS order.
+        """
+        self.target = target
+        self.builds += 1
+        costs = np.array(distance + [math.inf])
+        candidates = costs[self._neighbors] + self._step_cost
+        # argmin over the reversed steps picks the last of equal minimums
+        last_best = len(_FLOW_STEPS) - 1 - np.argmin(candidates[::-1], axis=0)
+        best = candidates[last_best, np.arange(len(distance))]
+        cost = costs[:-1]
+        pointing = (cost != math.inf) & (cost != 0) & (best <= cost)
+        choice = np.where(pointing, last_best, len(_FLOW_STEPS))
+        dir_x = self._step_x[choice]
+        dir_y = self._step_y[choice]
+        self.distance = distance
+        self.dir_x = dir_x.tolist()
+        self.dir_y = dir_y.tolist()
+        self._arrays = (np.append(dir_x, 0.0), np.append(dir_y, 0.0))
+    
+    def direction(self, x, y):
+        """Unit (dx, dy) to move from (x, y), or None to chase the player directly"""
+        index = self.cell(x, y)
+        if index is None:
+            return None
+        dir_x = self.dir_x[index]
+        dir_y = self.dir_y[index]
+        if dir_x == 0 and dir_y == 0:
+            return None
+        return dir_x, dir_y
+    
+    def directions(self, x, y):
+        """Vectorized direction: (dx, dy) arrays for position arrays, zero where chasing directly"""
+        flow_x, flow_y = self._arrays
+        col = np.floor((x + self.margin) / self.cell_size).astype(np.int64)
+        row = np.floor((y + self.margin) / self.cell_size).astype(np.int64)
+        inside = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        index = np.where(inside, row * self.cols + col, self.cols * self.rows)
+        return flow_x[index], flow_y[index]
 
 class Powerup:
     def __init__(self, x, y, powerup_type):
-        self.x = x
-        self.y = y
         self.width = 30
         self.height = 30
+        self.reset(x, y, powerup_type)
+    
+    def reset(self, x, y, powerup_type):
+        """(Re)place this powerup at (x, y) as an uncollected powerup_type"""
+        self.x = x
+        self.y = y
         self.type = powerup_type  # "speed" or "invincible"
         self.collected = False
         
@@ -375,73 +1578,811 @@ class Powerup:
         powerup_center_x = self.x + self.width // 2
         powerup_center_y = self.y + self.height // 2
         
-        distance = math.sqrt((player_center_x - powerup_center_x)**2 + 
-                           (player_center_y - powerup_center_y)**2)
+        dx = player_center_x - powerup_center_x
+        dy = player_center_y - powerup_center_y
         
-        if distance < 40:
+        if dx * dx + dy * dy < 40 * 40:
             self.collected = True
             return True
         return False
     
     def draw(self, screen):
+        """Draw the powerup and return the screen area it covers"""
         if self.collected:
+            return None
+        
+        sprite, (offset_x, offset_y) = get_sprite("powerup", self.type)
+        return screen.blit(sprite, (self.x - offset_x, self.y - offset_y))
+
+class EntityPool:
+    """Live entities plus a free list of dead ones kept for reuse.
+    
+    Dead entities are dropped by one order-preserving compaction pass per tick and
+    recycled by acquire() (via their reset method) instead of allocating new objects.
+    """
+    def __init__(self, factory, is_live):
+        self.factory = factory
+        self.is_live = is_live
+        self.active = []
+        self.free = []
+    
+    def __len__(self):
+        return len(self.active)
+    
+    def __iter__(self):
+        return iter(self.active)
+    
+    def __getitem__(self, index):
+        return self.active[index]
+    
+    def append(self, entity):
+        """Add an entity that was created outside the pool"""
+        self.active.append(entity)
+    
+    def acquire(self, *args):
+        """Spawn an entity, reusing a dead one when available"""
+        if self.free:
+            entity = self.free.pop()
+            entity.reset(*args)
+        else:
+            entity = self.factory(*args)
+        self.active.append(entity)
+        return entity
+    
+    def compact(self):
+        """Move dead entities to the free list in one pass; returns how many were removed"""
+        active = self.active
+        is_live = self.is_live
+        kept = 0
+        for entity in active:
+            if is_live(entity):
+                active[kept] = entity
+                kept += 1
+            else:
+                self.free.append(entity)
+        removed = len(active) - kept
+        del active[kept:]
+        return removed
+
+class DirtyRectRenderer:
+    """Presents only the screen regions that changed since the last frame.
+    
+    erase() restores last frame's rects from a cached background, the game then
+    draws as usual, and present() pushes the old and new rects with
+    pygame.display.update instead of flipping the whole screen. When a frame
+    touches more than max_rects regions it falls back to a full redraw.
+    """
+    def __init__(self, screen, background, max_rects=400):
+        self.screen = screen
+        self.background = background
+        self.screen_rect = screen.get_rect()
+        self.max_rects = max_rects
+        self.previous = []
+        self.full_redraw = True
+    
+    def invalidate(self):
+        """Redraw and present the whole screen next frame"""
+        self.full_redraw = True
+    
+    def erase(self):
+        if self.full_redraw or len(self.previous) > self.max_rects:
+            self.screen.blit(self.background, (0, 0))
+            self.full_redraw = True
             return
-            
-        if self.type == "speed":
-            # Draw speed powerup (lightning bolt)
-            pygame.draw.rect(screen, CYAN, (self.x, self.y, self.width, self.height))
-            pygame.draw.polygon(screen, YELLOW, [
-                (self.x + 15, self.y + 5),
-                (self.x + 10, self.y + 15),
-                (self.x + 18, self.y + 15),
-                (self.x + 12, self.y + 25)
-            ])
-            # Label
-            font = pygame.font.Font(None, 16)
-            text = font.render("2X", True, BLACK)
-            screen.blit(text, (self.x + 8, self.y + 2))
-            
-        elif self.type == "invincible":
-            # Draw invincibility powerup (shield)
-            pygame.draw.rect(screen, PURPLE, (self.x, self.y, self.width, self.height))
-            pygame.draw.circle(screen, GOLD, (self.x + 15, self.y + 15), 12, 3)
-            # Label
-            font = pygame.font.Font(None, 16)
-            text = font.render("INV", True, WHITE)
-            screen.blit(text, (self.x + 5, self.y + 10))
+        screen = self.screen
+        background = self.background
+        for rect in self.previous:
+            screen.blit(background, rect, rect)
+    
+    def present(self, rects):
+        screen_rect = self.screen_rect
+        current = [screen_rect.clip(rect) for rect in rects]
+        if self.full_redraw or len(current) + len(self.previous) > self.max_rects:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.previous + current)
+        self.previous = current
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty sequence, fraction in [0, 1]"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class _ProfiledPhase:
+    """Context manager timing one phase into a FrameProfiler"""
+    __slots__ = ("profiler", "name", "start")
+    
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+class FrameProfiler:
+    """Per-phase frame timings over a rolling window of recent frames.
+    
+    Game wraps each phase ("events", "update", "draw", "wait") and per-entity-type
+    subphase ("update.enemies", "draw.enemies", ...) in phase(); every finished
+    phase is passed to the phase hooks as (name, ms) and every finished frame to
+    the frame hooks as its record. A frame is counted as dropped when its busy
+    time (everything except waiting on the frame clock) exceeds the frame budget.
+    With keep_trace every frame record is also kept for export_csv/export_json.
+    """
+    def __init__(self, window=600, budget_ms=1000 / FPS, keep_trace=False):
+        self.frames = deque(maxlen=window)
+        self.budget_ms = budget_ms
+        self.trace = [] if keep_trace else None
+        self.phase_hooks = []
+        self.frame_hooks = []
+        self.current = {}
+        self.frame_start = None
+        self.frame_count = 0
+        self.dropped = 0
+        self.overlay_lines = []
+    
+    def phase(self, name):
+        return _ProfiledPhase(self, name)
+    
+    def record(self, name, ms):
+        self.current[name] = self.current.get(name, 0.0) + ms
+        for hook in self.phase_hooks:
+            hook(name, ms)
+    
+    def begin_frame(self):
+        self.current = {}
+        self.frame_start = time.perf_counter()
+    
+    def end_frame(self, **counts):
+        """Close the frame, storing its phase times plus entity counts"""
+        frame = self.current
+        frame["frame_ms"] = (time.perf_counter() - self.frame_start) * 1000
+        frame["busy_ms"] = frame["frame_ms"] - frame.get("wait", 0.0)
+        frame["dropped"] = frame["busy_ms"] > self.budget_ms
+        frame.update(counts)
+        self.frames.append(frame)
+        if self.trace is not None:
+            self.trace.append(frame)
+        self.frame_count += 1
+        if frame["dropped"]:
+            self.dropped += 1
+        for hook in self.frame_hooks:
+            hook(frame)
+    
+    def stats(self):
+        """Percentiles of frame and busy time, plus mean phase times, over the window"""
+        if not self.frames:
+            return {}
+        frame_times = [frame["frame_ms"] for frame in self.frames]
+        busy_times = [frame["busy_ms"] for frame in self.frames]
+        stats = {
+            "frames": self.frame_count,
+            "dropped": self.dropped,
+            "frame_p50_ms": percentile(frame_times, 0.50),
+            "frame_p95_ms": percentile(frame_times, 0.95),
+            "frame_p99_ms": percentile(frame_times, 0.99),
+            "busy_p50_ms": percentile(busy_times, 0.50),
+            "busy_p99_ms": percentile(busy_times, 0.99),
+        }
+        totals = {}
+        for frame in self.frames:
+            for name, value in frame.items():
+                if "." in name or name in ("events", "update", "draw", "wait"):
+                    totals[name] = totals.get(name, 0.0) + value
+        for name, total in totals.items():
+            stats[name + "_ms"] = total / len(self.frames)
+        return stats
+    
+    def draw_overlay(self, surface, font, refresh_frames=30):
+        """Draw the stats panel in the bottom-left corner and return its rect.
+        
+        The text is only re-rendered every refresh_frames frames.
+        """
+        if not self.overlay_lines or self.frame_count % refresh_frames == 0:
+            stats = self.stats()
+            if not stats:
+                return None
+            last = self.frames[-1]
+            lines = [
+                f"frame p50/p95/p99: {stats['frame_p50_ms']:.1f} / {stats['frame_p95_ms']:.1f}"
+                f" / {stats['frame_p99_ms']:.1f} ms",
+                f"busy p50/p99: {stats['busy_p50_ms']:.1f} / {stats['busy_p99_ms']:.1f} ms"
+                f"  dropped: {stats['dropped']}/{stats['frames']}",
+                f"update {stats.get('update_ms', 0):.2f}  draw {stats.get('draw_ms', 0):.2f}"
+                f"  events {stats.get('events_ms', 0):.2f} ms",
+            ]
+            for name in ("enemies", "player", "powerups", "hud"):
+                update_ms = stats.get(f"update.{name}_ms")
+                draw_ms = stats.get(f"draw.{name}_ms")
+                if update_ms is not None or draw_ms is not None:
+                    lines.append(f"  {name}: update {update_ms or 0:.2f}  draw {draw_ms or 0:.2f} ms")
+            lines.append(f"enemies: {last.get('enemies', 0)}  powerups: {last.get('powerups', 0)}")
+            self.overlay_lines = [font.render(line, True, WHITE) for line in lines]
+        
+        line_height = font.get_linesize()
+        width = max(line.get_width() for line in self.overlay_lines) + 12
+        height = line_height * len(self.overlay_lines) + 8
+        rect = pygame.Rect(0, surface.get_height() - height, width, height)
+        surface.fill(BLACK, rect)
+        for i, line in enumerate(self.overlay_lines):
+            surface.blit(line, (rect.x + 6, rect.y + 4 + i * line_height))
+        return rect
+    
+    def _trace_columns(self):
+        columns = []
+        for frame in self.trace:
+            for name in frame:
+                if name not in columns:
+                    columns.append(name)
+        return columns
+    
+    def export_csv(self, path):
+        """Write one row per traced frame"""
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self._trace_columns(), restval="")
+            writer.writeheader()
+            writer.writerows(self.trace)
+    
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump({"budget_ms": self.budget_ms, "stats": self.stats(), "frames": self.trace}, f)
+    
+    def export(self, path):
+        """Write the trace as CSV or JSON, chosen by the file extension"""
+        if path.endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
+
+# Snapshot layout: header, game, player, RNG state and counts as little-endian
+# structs, then fixed-width columns for hit enemy uids, enemies and powerups, each
+# padded to 8 bytes. Enemy columns match EnemyArrays so they can be used in place.
+SNAPSHOT_MAGIC = b"ZPSN"
+SNAPSHOT_VERSION = 3
+_SNAPSHOT_HEADER = struct.Struct("<4sHB")  # magic, version, flags (1 = array enemies)
+_SNAPSHOT_GAME_FIELDS = (
+    ("tick", "q"), ("score", "q"), ("spawn_timer", "q"), ("powerup_spawn_timer", "q"),
+    ("spawn_interval", "q"), ("powerup_spawn_interval", "q"), ("enemy_speed", "d"),
+    ("seed", "Q"), ("running", "?"), ("enemy_uid_counter", "q"),
+)
+_SNAPSHOT_PLAYER_FIELDS = (
+    ("x", "d"), ("y", "d"), ("speed", "d"), ("health", "q"), ("punch_cooldown", "q"),
+    ("base_punch_cooldown", "q"), ("punch_hit_radius", "d"), ("punch_damage", "q"),
+    ("is_punching", "?"), ("punch_timer", "q"), ("punch_extension", "d"),
+    ("punch_angle", "d"), ("punch_dir_x", "d"), ("punch_dir_y", "d"), ("punch_bucket", "q"),
+    ("invincible", "?"), ("invincible_timer", "q"),
+    ("double_speed", "?"), ("double_speed_timer", "q"),
+)
+_SNAPSHOT_GAME = struct.Struct("<" + "".join(code for _, code in _SNAPSHOT_GAME_FIELDS))
+_SNAPSHOT_PLAYER = struct.Struct("<" + "".join(code for _, code in _SNAPSHOT_PLAYER_FIELDS))
+_SNAPSHOT_RNG = struct.Struct("<625I?d")  # Mersenne Twister state, has gauss_next, gauss_next
+_SNAPSHOT_COUNTS = struct.Struct("<qqq")  # hit enemies, enemies, powerups
+# (attribute, array typecode); typecodes match the EnemyArrays dtypes byte for byte
+_SNAPSHOT_ENEMY_COLUMNS = (("x", "d"), ("y", "d"), ("health", "i"), ("alive", "b"),
+                           ("attack_cooldown", "i"), ("uid", "q"), ("speed", "d"),
+                           ("max_health", "i"))
+_SNAPSHOT_POWERUP_COLUMNS = (("x", "d"), ("y", "d"), ("type", "b"))
+_NUMPY_TYPES = {"d": "float64", "i": "int32", "b": "bool", "q": "int64"}
+
+def _padded(size):
+    return (size + 7) & ~7
+
+def _read_column(buffer, offset, typecode, count, as_numpy):
+    """A column of a snapshot buffer, as a NumPy array or memoryview over the buffer.
+    
+    NumPy columns of a writable buffer (bytearray, copy-on-write mmap) are used in
+    place; read-only buffers are copied so the game can keep mutating them.
+    """
+    size = array(typecode).itemsize * count
+    if as_numpy:
+        column = np.frombuffer(buffer, dtype=_NUMPY_TYPES[typecode], count=count, offset=offset)
+        if not column.flags.writeable:
+            column = column.copy()
+    else:
+        column = memoryview(buffer)[offset:offset + size].cast("B").cast(typecode)
+    return column, offset + _padded(size)
+
+class SnapshotRing:
+    """The newest game snapshots, taken every `interval` ticks, for cheap rewinding.
+    
+    Add it to Game.tick_hooks to capture automatically.
+    """
+    def __init__(self, capacity=10, interval=FPS):
+        self.interval = interval
+        self.snapshots = deque(maxlen=capacity)
+    
+    def __call__(self, game):
+        if game.tick % self.interval == 0:
+            self.capture(game)
+    
+    def capture(self, game):
+        self.snapshots.append((game.tick, game.snapshot()))
+    
+    def rewind(self, game, ticks=0):
+        """Restore the newest snapshot at least `ticks` ticks old; returns its tick or None"""
+        target = game.tick - ticks
+        while self.snapshots:
+            tick, data = self.snapshots[-1]
+            if tick <= target:
+                game.restore(data)
+                return tick
+            self.snapshots.pop()
+        return None
+
+def checkpoint_hook(path, interval):
+    """Tick hook saving a snapshot to path every `interval` ticks, for crash recovery"""
+    def hook(game):
+        if game.tick % interval == 0:
+            game.save_snapshot(path)
+    return hook
+
+def _edge_formation(rng, count):
+    """Random points just off each screen edge, like Game.spawn_enemy"""
+    side = rng.integers(0, 4, count)
+    along_x = rng.uniform(0, SCREEN_WIDTH - 40, count)
+    along_y = rng.uniform(0, SCREEN_HEIGHT - 60, count)
+    x = np.where(side % 2 == 0, along_x, np.where(side == 1, SCREEN_WIDTH, -40))
+    y = np.where(side % 2 == 1, along_y, np.where(side == 0, -60, SCREEN_HEIGHT))
+    return x, y
+
+def _ring_formation(rng, count):
+    """Random points on a circle just outside the screen, closing in from every side"""
+    angle = rng.uniform(0, 2 * math.pi, count)
+    radius = math.hypot(SCREEN_WIDTH, SCREEN_HEIGHT) / 2 + 40
+    x = SCREEN_WIDTH / 2 + np.cos(angle) * radius - 20
+    y = SCREEN_HEIGHT / 2 + np.sin(angle) * radius - 30
+    return x, y
+
+FORMATIONS = {"edges": _edge_formation, "ring": _ring_formation}
+
+class Wave:
+    """`count` enemies of one type, spawned evenly over `duration` ticks from `tick`"""
+    def __init__(self, tick, count, enemy_type="walker", formation="edges", duration=1):
+        self.tick = tick
+        self.count = count
+        self.enemy_type = enemy_type
+        self.formation = formation
+        self.duration = duration
+
+class WaveScheduler:
+    """Spawns enemies from a wave script in place of Game's steady one-enemy timer.
+    
+    Positions for a whole pass through the script are generated ahead of time
+    into a table of per-tick batches, each added with one Game.add_enemies call.
+    At most max_spawns_per_tick enemies go in per tick and the rest queue for the
+    following ticks, so a burst of thousands is spread over several frames. With
+    repeat_every the script loops, each pass multiplying wave sizes by growth.
+    
+    Wave ticks are game ticks (0 is the first Game.update). Each pass draws its
+    positions from its own seed, so the schedule is a function of the game tick
+    alone: when the game's tick jumps (a restored snapshot, a rewind, a scheduler
+    attached mid-game) update rebuilds the scheduler's state for it with seek.
+    """
+    def __init__(self, waves, seed=0, max_spawns_per_tick=256, repeat_every=None, growth=1.0):
+        if np is None:
+            raise RuntimeError("WaveScheduler needs numpy installed")
+        self.waves = sorted(waves, key=lambda wave: wave.tick)
+        self.seed = seed
+        self.max_spawns_per_tick = max_spawns_per_tick
+        self.repeat_every = repeat_every
+        self.growth = growth
+        self.seek(0)
+    
+    @classmethod
+    def from_script(cls, script, seed=0):
+        """Build from a dict like {"waves": [{"tick": 0, "count": 500, "type": "runner",
+        "formation": "ring", "duration": 60}], "repeat_every": 1800, "growth": 1.5}"""
+        waves = [Wave(wave["tick"], wave["count"], wave.get("type", "walker"),
+                      wave.get("formation", "edges"), wave.get("duration", 1))
+                 for wave in script["waves"]]
+        for wave in waves:
+            if wave.enemy_type not in ENEMY_TYPES or wave.formation not in FORMATIONS:
+                raise ValueError(f"unknown enemy type or formation in wave at tick {wave.tick}")
+        return cls(waves, seed, script.get("max_spawns_per_tick", 256),
+                   script.get("repeat_every"), script.get("growth", 1.0))
+    
+    @classmethod
+    def load(cls, path, seed=0):
+        with open(path) as f:
+            return cls.from_script(json.load(f), seed)
+    
+    def batches(self, cycle, positions=True):
+        """List the (tick, enemy_type, xs, ys) batches of one pass through the script,
+        sized for that cycle, in the order they queue. With positions=False no
+        positions are drawn: xs is just the batch size and ys is None."""
+        offset = cycle * (self.repeat_every or 0)
+        scale = self.growth ** cycle
+        rng = np.random.default_rng([self.seed, cycle]) if positions else None
+        batches = []
+        for wave in self.waves:
+            count = round(wave.count * scale)
+            if positions:
+                xs, ys = FORMATIONS[wave.formation](rng, count)
+            enemy_type = ENEMY_TYPES[wave.enemy_type]
+            duration = max(wave.duration, 1)
+            for step in range(duration):
+                start = count * step // duration
+                end = count * (step + 1) // duration
+                if end > start:
+                    if positions:
+                        batches.append((offset + wave.tick + step, enemy_type,
+                                        xs[start:end], ys[start:end]))
+                    else:
+                        batches.append((offset + wave.tick + step, enemy_type, end - start, None))
+        return batches
+    
+    def plan(self, cycle):
+        """Add one pass through the script, sized for that cycle, to the spawn table"""
+        for tick, enemy_type, xs, ys in self.batches(cycle):
+            self.table.setdefault(tick, []).append((enemy_type, xs, ys))
+    
+    @property
+    def backlog(self):
+        """Enemies due to spawn that are still waiting for spawn budget"""
+        return sum(len(xs) for _, xs, _ in self.pending)
+    
+    @property
+    def done(self):
+        return not self.repeat_every and not self.table and not self.pending
+    
+    def seek(self, tick):
+        """Set the state to what it is after schedule ticks 0..tick-1, without spawning anything.
+        
+        Rather than stepping through every tick, the spawn budget is run over batch
+        sizes alone, one batch at a time, to find how many enemies are still queued;
+        positions are only drawn for the passes that still have batches queued or
+        in the table.
+        """
+        self.tick = tick
+        self.cycle = (tick - 1) // self.repeat_every if self.repeat_every and tick > 0 else 0
+        budget = self.max_spawns_per_tick
+        
+        # Every batch queued before tick, as (tick, cycle, index in pass, size) in queue order
+        arrived = []
+        upcoming = set()  # Passes with batches still in the table
+        for cycle in range(self.cycle + 1):
+            for index, (batch_tick, _, size, _) in enumerate(self.batches(cycle, positions=False)):
+                if batch_tick < tick:
+                    arrived.append((batch_tick, cycle, index, size))
+                else:
+                    upcoming.add(cycle)
+        arrived.sort()
+        queued = 0  # Enemies waiting on last_tick, before that tick's spawns
+        last_tick = -1
+        for batch_tick, _, _, size in arrived:
+            if batch_tick != last_tick:
+                queued = max(queued - budget * (batch_tick - last_tick), 0)
+                last_tick = batch_tick
+            queued += size
+        queued = max(queued - budget * (tick - last_tick), 0) if arrived else 0
+        self.spawned = sum(size for _, _, _, size in arrived) - queued
+        
+        # The queue holds the last `queued` enemies to arrive, the first batch cut short
+        waiting = []
+        waiting_size = 0
+        while waiting_size < queued:
+            waiting.append(arrived.pop())
+            waiting_size += waiting[-1][3]
+        waiting.reverse()
+        passes = {cycle: self.batches(cycle)
+                  for cycle in sorted(upcoming | {cycle for _, cycle, _, _ in waiting})}
+        self.pending = deque()
+        for _, cycle, index, _ in waiting:
+            _, enemy_type, xs, ys = passes[cycle][index]
+            self.pending.append((enemy_type, xs, ys))
+        if waiting:
+            cut = waiting_size - queued
+            enemy_type, xs, ys = self.pending[0]
+            self.pending[0] = (enemy_type, xs[cut:], ys[cut:])
+        self.table = {}
+        for cycle, batches in passes.items():
+            for batch_tick, enemy_type, xs, ys in batches:
+                if batch_tick >= tick:
+                    self.table.setdefault(batch_tick, []).append((enemy_type, xs, ys))
+    
+    def update(self, game):
+        """Spawn what is due on this game tick"""
+        tick = game.tick - 1
+        if tick != self.tick:
+            self.seek(tick)
+        self.step(game)
+    
+    def step(self, game):
+        """Advance one schedule tick, adding its enemies to game (just counting them if None)"""
+        tick = self.tick
+        self.tick += 1
+        if self.repeat_every and tick >= (self.cycle + 1) * self.repeat_every:
+            self.cycle += 1
+            self.plan(self.cycle)
+        batches = self.table.pop(tick, None)
+        if batches:
+            self.pending.extend(batches)
+        
+        budget = self.max_spawns_per_tick
+        while self.pending and budget > 0:
+            enemy_type, xs, ys = self.pending[0]
+            if len(xs) > budget:
+                if game is not None:
+                    game.add_enemies(xs[:budget], ys[:budget], enemy_type)
+                self.pending[0] = (enemy_type, xs[budget:], ys[budget:])
+                self.spawned += budget
+                break
+            if game is not None:
+                game.add_enemies(xs, ys, enemy_type)
+            self.pending.popleft()
+            budget -= len(xs)
+            self.spawned += len(xs)
+
+class ParticleSystem:
+    """Cosmetic particles (PARTICLE_KINDS) in fixed-capacity NumPy columns.
+    
+    Live particles are kept packed at the front of the columns, oldest first.
+    Each tick moves, ages and expires them all in one vectorized pass; drawing
+    is one blits call over the cached "particle" sprites. A burst that would
+    overflow capacity evicts the oldest particles, and a single burst bigger than
+    capacity keeps only its last particles. Particles have their own random
+    generator and never touch simulation state, so replays are unaffected.
+    """
+    FIELDS = (("x", "f4"), ("y", "f4"), ("vx", "f4"), ("vy", "f4"),
+              ("age", "i2"), ("life", "i2"), ("kind", "i1"))
+    
+    def __init__(self, capacity=8192, seed=0):
+        if np is None:
+            raise RuntimeError("ParticleSystem needs numpy installed")
+        self.capacity = capacity
+        self.count = 0
+        self.evicted = 0  # Particles dropped early to stay within capacity
+        self.rng = np.random.default_rng(seed)
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.kind_drag = np.array([kind.drag for kind in PARTICLE_KINDS], dtype=np.float32)
+        self.kind_gravity = np.array([kind.gravity for kind in PARTICLE_KINDS], dtype=np.float32)
+    
+    def __len__(self):
+        return self.count
+    
+    def clear(self):
+        self.count = 0
+    
+    def emit(self, kind_name, x, y, angle=None):
+        """Launch kind.count particles from each origin (scalars or arrays of x and y).
+        
+        With an angle they fly within kind.spread of it, otherwise in any direction.
+        """
+        kind_id = PARTICLE_KIND_IDS[kind_name]
+        kind = PARTICLE_KINDS[kind_id]
+        x, y = np.broadcast_arrays(np.atleast_1d(np.asarray(x, dtype=np.float32)),
+                                   np.atleast_1d(np.asarray(y, dtype=np.float32)))
+        total = len(x) * kind.count
+        if total == 0:
+            return
+        if total > self.capacity:
+            # Only the newest capacity's worth would survive eviction anyway
+            self.evicted += total - self.capacity
+            total = self.capacity
+        overflow = self.count + total - self.capacity
+        if overflow > 0:
+            # Evict the oldest particles from the front, keeping the rest in order
+            keep = self.count - overflow
+            for name, _ in self.FIELDS:
+                column = getattr(self, name)
+                column[:keep] = column[overflow:self.count]
+            self.count = keep
+            self.evicted += overflow
+        start = self.count
+        end = start + total
+        rng = self.rng
+        base = 0.0 if angle is None else angle
+        spread = math.pi if angle is None else kind.spread
+        directions = base + rng.uniform(-spread, spread, total)
+        speeds = kind.speed * rng.uniform(0.3, 1.0, total)
+        self.x[start:end] = np.repeat(x, kind.count)[-total:]
+        self.y[start:end] = np.repeat(y, kind.count)[-total:]
+        self.vx[start:end] = np.cos(directions) * speeds
+        self.vy[start:end] = np.sin(directions) * speeds
+        self.age[start:end] = 0
+        self.life[start:end] = rng.integers(kind.life // 2, kind.life, total, endpoint=True)
+        self.kind[start:end] = kind_id
+        self.count = end
+    
+    # Blood bursts for one punch; past this many hits more would only pile onto the same spot
+    MAX_HIT_BURSTS = 8
+    
+    def hit(self, fist_x, fist_y, punch_angle, hits):
+        """Sparks at the fist and blood sprayed along the punch, a burst per enemy hit"""
+        bursts = min(hits, self.MAX_HIT_BURSTS)
+        self.emit("spark", fist_x, fist_y)
+        self.emit("blood", np.full(bursts, fist_x), np.full(bursts, fist_y), punch_angle)
+    
+    def update(self):
+        """Move, slow and age every particle one tick, then drop the expired"""
+        n = self.count
+        if n == 0:
+            return
+        kind = self.kind[:n]
+        vx = self.vx[:n]
+        vy = self.vy[:n]
+        drag = self.kind_drag[kind]
+        vx *= drag
+        vy *= drag
+        vy += self.kind_gravity[kind]
+        self.x[:n] += vx
+        self.y[:n] += vy
+        age = self.age[:n]
+        age += 1
+        alive = age < self.life[:n]
+        if alive.all():
+            return
+        keep = np.flatnonzero(alive)
+        for name, _ in self.FIELDS:
+            column = getattr(self, name)
+            column[:len(keep)] = column[keep]
+        self.count = len(keep)
+    
+    def draw(self, screen, alpha=1.0, rects=False):
+        """Blit every particle, `alpha` of the way through the last tick's move.
+        
+        Returns the blitted areas when rects is true (for dirty-rect rendering).
+        """
+        n = self.count
+        if n == 0:
+            return []
+        sprites = []
+        for kind in PARTICLE_KINDS:
+            for step in range(PARTICLE_FADE_STEPS):
+                sprites.append(get_sprite("particle", (kind.name, step))[0])
+        _, _, offset_x, offset_y, _ = SPRITE_LAYOUTS["particle"]
+        back = 1.0 - alpha
+        xs = (self.x[:n] - self.vx[:n] * back - offset_x).astype(np.int32)
+        ys = (self.y[:n] - self.vy[:n] * back - offset_y).astype(np.int32)
+        steps = self.age[:n].astype(np.int32) * PARTICLE_FADE_STEPS // self.life[:n]
+        sprite_ids = self.kind[:n].astype(np.int32) * PARTICLE_FADE_STEPS + steps
+        return screen.blits([(sprites[sprite_id], (x, y)) for sprite_id, x, y
+                             in zip(sprite_ids.tolist(), xs.tolist(), ys.tolist())], rects) or []
+
+# Stands in for a profiler phase when profiling is off
+_NOT_PROFILED = contextlib.nullcontext()
 
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Zombie Puncher")
-        self.clock = pygame.time.Clock()
+    def __init__(self, headless=False, array_enemies=False, dirty_rects=False,
+                 seed=None, record=False, profiler=None):
+        # Headless games never open a window; they are stepped with run_headless
+        self.headless = headless
+        # Keep enemies in NumPy arrays (EnemyArrays) instead of a list of Enemy objects
+        self.array_enemies = array_enemies
+        self.screen = None
+        self.clock = None
+        self.font = None
+        self.small_font = None
+        self.text_cache = None
+        self.renderer = None
+        if not headless:
+            init_display()
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("Zombie Puncher")
+            self.clock = pygame.time.Clock()
+            self.font = get_font(36)
+            self.small_font = get_font(24)
+            # HUD text only re-renders when its string (score, health, timer) changes
+            self.text_cache = TextCache()
+            if dirty_rects:
+                # Static instructions live in the cached background and are never redrawn
+                background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+                background.fill(WHITE)
+                self.draw_instructions(background)
+                self.renderer = DirtyRectRenderer(self.screen, background)
         self.running = True
+        self.tick = 0
+        self.punch_pressed = False
+        
+        # Every game gets a concrete seed so that any run can be replayed
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.recording = Recording(seed) if record else None
+        
+        # Called with the game after every tick (SnapshotRing, checkpoint_hook, ...)
+        self.tick_hooks = []
+        
+        # Optional TelemetryBus for gameplay analytics (see attach_telemetry)
+        self.telemetry = None
+        
+        # Keep each tick's starting positions so frames can be drawn between ticks (see run)
+        self.interpolate = False
+        self.dropped_ticks = 0
+        # How far between the last two ticks the frame being drawn is (see interpolated)
+        self.draw_alpha = 1.0
+        
+        # Optional FrameProfiler; F3 toggles its overlay in the windowed game
+        self.profiler = profiler
+        self.show_profiler = False
         
         self.player = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
-        self.enemies = []
-        self.powerups = []
+        # Hit, death and pickup particles; purely cosmetic, so only windowed games have them
+        self.effects = None
+        if not headless and np is not None:
+            self.effects = ParticleSystem(seed=seed)
+            self.player.effects = self.effects
+        if array_enemies:
+            self.enemies = EnemyArrays()
+        else:
+            self.enemies = EntityPool(Enemy, lambda enemy: enemy.alive)
+        # Next uid for the object backend (EnemyArrays counts its own); per game, so
+        # uid-based tie-breaks are the same for every game with the same seed
+        self.next_enemy_uid = 0
+        self.powerups = EntityPool(Powerup, lambda powerup: not powerup.collected)
+        self.enemy_grid = SpatialHash()
+        self.powerup_grid = SpatialHash()
         self.spawn_timer = 0
         self.powerup_spawn_timer = 0
+        # Tunables (see punchgame_sweep.py)
+        self.spawn_interval = 120  # Spawn an enemy every 2 seconds
+        self.powerup_spawn_interval = 600  # Spawn a powerup every 10 seconds
+        self.enemy_speed = 2
+        # Optional WaveScheduler; replaces the spawn_interval enemy timer when set
+        self.waves = None
+        # Optional Separation steering that keeps hordes from collapsing onto one point
+        self.separation = None
+        # Optional FlowField the enemies follow instead of chasing the player in a straight line
+        self.flow_field = None
         self.score = 0
-        self.font = pygame.font.Font(None, 36)
         
     def spawn_enemy(self):
         # Spawn enemy at random edge of screen
-        side = random.randint(0, 3)
+        side = self.rng.randint(0, 3)
         if side == 0:  # Top
-            x = random.randint(0, SCREEN_WIDTH - 40)
+            x = self.rng.randint(0, SCREEN_WIDTH - 40)
             y = -60
         elif side == 1:  # Right
             x = SCREEN_WIDTH
-            y = random.randint(0, SCREEN_HEIGHT - 60)
+            y = self.rng.randint(0, SCREEN_HEIGHT - 60)
         elif side == 2:  # Bottom
-            x = random.randint(0, SCREEN_WIDTH - 40)
+            x = self.rng.randint(0, SCREEN_WIDTH - 40)
             y = SCREEN_HEIGHT
         else:  # Left
             x = -40
-            y = random.randint(0, SCREEN_HEIGHT - 60)
-            
-        self.enemies.append(Enemy(x, y))
+            y = self.rng.randint(0, SCREEN_HEIGHT - 60)
+        
+        self.add_enemy(x, y)
+    
+    @property
+    def enemy_uid_counter(self):
+        """Uid the next spawned enemy will get, from whichever backend hands them out"""
+        return self.enemies.next_uid if self.array_enemies else self.next_enemy_uid
+    
+    @enemy_uid_counter.setter
+    def enemy_uid_counter(self, value):
+        if self.array_enemies:
+            self.enemies.next_uid = value
+        else:
+            self.next_enemy_uid = value
+    
+    def add_enemy(self, x, y, enemy_type=ENEMY_TYPES["walker"]):
+        """Put a fresh enemy at (x, y) in whichever population backend is in use"""
+        speed = self.enemy_speed * enemy_type.speed_scale
+        if self.array_enemies:
+            self.enemies.spawn(x, y, speed, enemy_type.health)
+        else:
+            enemy = self.enemies.acquire(x, y, self.next_enemy_uid)
+            self.next_enemy_uid += 1
+            enemy.speed = speed
+            enemy.max_health = enemy.health = enemy_type.health
+    
+    def add_enemies(self, xs, ys, enemy_type=ENEMY_TYPES["walker"]):
+        """Put a batch of enemies at xs, ys; the array backend allocates them in one operation"""
+        if self.array_enemies:
+            self.enemies.spawn_many(xs, ys, self.enemy_speed * enemy_type.speed_scale,
+                                    enemy_type.health)
+        else:
+            for x, y in zip(xs, ys):
+                self.add_enemy(float(x), float(y), enemy_type)
     
     def handle_events(self):
         for event in pygame.event.get():
@@ -449,95 +2390,527 @@ class Game:
                 self.running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    self.player.punch()
+                    self.punch_pressed = True
+                elif event.key == pygame.K_F3 and self.profiler is not None:
+                    self.show_profiler = not self.show_profiler
+                    if self.renderer is not None:
+                        self.renderer.invalidate()
+    
+    def read_input(self):
+        """Build this tick's input from the live keyboard and mouse state"""
+        keys = pygame.key.get_pressed()
+        mouse_x, mouse_y = pygame.mouse.get_pos()
+        inputs = TickInput(
+            left=keys[pygame.K_LEFT] or keys[pygame.K_a],
+            right=keys[pygame.K_RIGHT] or keys[pygame.K_d],
+            up=keys[pygame.K_UP] or keys[pygame.K_w],
+            down=keys[pygame.K_DOWN] or keys[pygame.K_s],
+            punch=self.punch_pressed,
+            aim_x=mouse_x,
+            aim_y=mouse_y,
+        )
+        self.punch_pressed = False
+        return inputs
     
     def spawn_powerup(self):
         """Spawn a random powerup at a random location"""
-        x = random.randint(50, SCREEN_WIDTH - 80)
-        y = random.randint(50, SCREEN_HEIGHT - 80)
-        powerup_type = random.choice(["speed", "invincible"])
-        self.powerups.append(Powerup(x, y, powerup_type))
+        x = self.rng.randint(50, SCREEN_WIDTH - 80)
+        y = self.rng.randint(50, SCREEN_HEIGHT - 80)
+        powerup_type = self.rng.choice(POWERUP_TYPES)
+        self.powerups.acquire(x, y, powerup_type)
     
-    def update(self):
-        self.player.update(self.enemies)
+    def update(self, inputs=None):
+        """Advance the simulation by one fixed tick (1/FPS seconds of game time)"""
+        if inputs is None:
+            inputs = TickInput()
+        if self.recording is not None:
+            self.recording.append(inputs)
+        self.tick += 1
+        if self.telemetry is not None:
+            self.telemetry.tick = self.tick
+        if self.interpolate:
+            self.store_previous_positions()
         
-        # Update enemies
-        for enemy in self.enemies[:]:
-            enemy.update(self.player)
-            if not enemy.alive:
-                self.enemies.remove(enemy)
-                self.score += 10
+        # Index everything at most once per tick so hit tests only look at nearby cells.
+        # Enemies are only indexed if a punch queries them; the array backend tests
+        # all enemies in one vectorized pass instead.
+        with self.phase("update.grid"):
+            if not self.array_enemies:
+                self.enemy_grid.mark_stale(self.enemies)
+            self.powerup_grid.rebuild(self.powerups)
+        
+        with self.phase("update.player"):
+            self.player.update(self.enemies, inputs, self.enemy_grid)
+        
+        with self.phase("update.enemies"):
+            self.update_enemies()
+        
+        if self.effects is not None:
+            with self.phase("update.effects"):
+                self.effects.update()
         
         # Check powerup collection
-        for powerup in self.powerups[:]:
-            if powerup.check_collision(self.player):
-                self.player.activate_powerup(powerup.type)
-                self.powerups.remove(powerup)
+        with self.phase("update.powerups"):
+            self.collect_powerups(self.player)
+            self.powerups.compact()
+        
+        self.update_spawners()
         
+        # Check game over
+        if self.player.health <= 0:
+            self.running = False
+        
+        for hook in self.tick_hooks:
+            hook(self)
+    
+    def attach_telemetry(self, bus):
+        """Send this game's events to a TelemetryBus, starting with a start record"""
+        self.telemetry = bus
+        self.player.events = bus
+        bus.tick = self.tick
+        bus.emit("start", self.seed)
+    
+    def emit_end(self):
+        """Emit the end-of-game telemetry record"""
+        if self.telemetry is not None:
+            self.telemetry.emit("end", self.score, int(self.player.health <= 0))
+    
+    def collect_powerups(self, player):
+        """Give player every powerup it touches (collected ones are compacted by the caller)"""
+        player_center_x = player.x + player.width // 2
+        player_center_y = player.y + player.height // 2
+        for powerup in self.powerup_grid.query(player_center_x, player_center_y, 40):
+            if powerup.check_collision(player):
+                player.activate_powerup(powerup.type)
+                if self.effects is not None:
+                    self.effects.emit("pickup_" + powerup.type, powerup.x + powerup.width // 2,
+                                      powerup.y + powerup.height // 2)
+    
+    def update_spawners(self):
+        """Advance the enemy and powerup spawn timers, spawning when they run out"""
         # Spawn new enemies
-        self.spawn_timer += 1
-        if self.spawn_timer >= 120:  # Spawn every 2 seconds
-            self.spawn_enemy()
-            self.spawn_timer = 0
+        if self.waves is not None:
+            self.waves.update(self)
+        else:
+            self.spawn_timer += 1
+            if self.spawn_timer >= self.spawn_interval:
+                self.spawn_enemy()
+                self.spawn_timer = 0
         
         # Spawn powerups
         self.powerup_spawn_timer += 1
-        if self.powerup_spawn_timer >= 600:  # Spawn every 10 seconds
+        if self.powerup_spawn_timer >= self.powerup_spawn_interval:
             self.spawn_powerup()
             self.powerup_spawn_timer = 0
-        
-        # Check game over
-        if self.player.health <= 0:
-            self.running = False
+    
+    def draw_instructions(self, surface):
+        instructions = [
+            "WASD/Arrow Keys: Move",
+            "SPACE: Punch (aim with mouse)",
+            "Collect powerups!"
+        ]
+        for i, instruction in enumerate(instructions):
+            text = self.text_cache.render(self.small_font, instruction, GRAY)
+            surface.blit(text, (SCREEN_WIDTH - 280, 10 + i * 25))
     
     def draw(self):
-        self.screen.fill(WHITE)
+        screen = self.screen
+        if self.renderer is None:
+            # Same layering as the dirty-rect background: instructions under everything
+            screen.fill(WHITE)
+            self.draw_instructions(screen)
+        else:
+            self.renderer.erase()
         
-        # Draw game objects
-        for powerup in self.powerups:
-            powerup.draw(self.screen)
+        # Draw game objects, collecting the areas they cover for the dirty-rect renderer
+        with self.phase("draw.powerups"):
+            dirty = [powerup.draw(screen) for powerup in self.powerups if not powerup.collected]
+        with self.phase("draw.player"):
+            dirty.extend(self.draw_players(screen))
         
-        self.player.draw(self.screen)
+        # Enemies share one sprite, so submit the whole horde as a single batch
+        with self.phase("draw.enemies"):
+            if self.array_enemies:
+                dirty.extend(self.enemies.draw(screen, self.renderer is not None))
+            else:
+                sprite, (offset_x, offset_y) = get_sprite("enemy")
+                sprite_rects = screen.blits([(sprite, (enemy.x - offset_x, enemy.y - offset_y))
+                                             for enemy in self.enemies if enemy.alive],
+                                            self.renderer is not None)
+                if sprite_rects:
+                    dirty.extend(sprite_rects)
+                for enemy in self.enemies:
+                    if enemy.alive:
+                        dirty.append(enemy.draw_health_bar(screen))
         
-        for enemy in self.enemies:
-            enemy.draw(self.screen)
+        if self.effects is not None:
+            with self.phase("draw.effects"):
+                dirty.extend(self.effects.draw(screen, self.draw_alpha, self.renderer is not None))
+        
+        with self.phase("draw.hud"):
+            self.draw_hud(screen, dirty)
         
-        # Draw UI
-        score_text = self.font.render(f"Score: {self.score}", True, BLACK)
-        self.screen.blit(score_text, (10, 10))
+        if self.show_profiler:
+            dirty.append(self.profiler.draw_overlay(screen, self.small_font))
+        
+        with self.phase("draw.present"):
+            if self.renderer is None:
+                pygame.display.flip()
+            else:
+                self.renderer.present(rect for rect in dirty if rect is not None)
+    
+    def draw_players(self, screen):
+        """Draw every player, returning the areas they cover"""
+        return [self.player.draw(screen)]
+    
+    def draw_hud(self, screen, dirty):
+        """Draw score, health and powerup timers, adding their rects to dirty"""
+        render_text = self.text_cache.render
+        score_text = render_text(self.font, f"Score: {self.score}", BLACK)
+        dirty.append(screen.blit(score_text, (10, 10)))
         
-        health_text = self.font.render(f"Health: {self.player.health}", True, BLACK)
-        self.screen.blit(health_text, (10, 50))
+        health_text = render_text(self.font, f"Health: {self.player.health}", BLACK)
+        dirty.append(screen.blit(health_text, (10, 50)))
         
         # Draw active powerup indicators
-        small_font = pygame.font.Font(None, 24)
         if self.player.invincible:
-            inv_text = small_font.render(f"INVINCIBLE: {self.player.invincible_timer // 60}s", True, GOLD)
-            self.screen.blit(inv_text, (10, 90))
+            inv_text = render_text(self.small_font, f"INVINCIBLE: {self.player.invincible_timer // 60}s", GOLD)
+            dirty.append(screen.blit(inv_text, (10, 90)))
         
         if self.player.double_speed:
-            speed_text = small_font.render(f"DOUBLE SPEED: {self.player.double_speed_timer // 60}s", True, CYAN)
-            self.screen.blit(speed_text, (10, 115))
+            speed_text = render_text(self.small_font, f"DOUBLE SPEED: {self.player.double_speed_timer // 60}s", CYAN)
+            dirty.append(screen.blit(speed_text, (10, 115)))
+    
+    def phase(self, name):
+        """Context manager timing a frame phase when a profiler is attached"""
+        if self.profiler is None:
+            return _NOT_PROFILED
+        return self.profiler.phase(name)
+    
+    def run_headless(self, ticks, policy=None):
+        """Step up to `ticks` ticks as fast as possible, with no window or frame clock.
         
-        # Draw instructions
-        instruction_font = pygame.font.Font(None, 24)
-        instructions = [
-            "WASD/Arrow Keys: Move",
-            "SPACE: Punch (aim with mouse)",
-            "Collect powerups!"
+        `policy` is called with the game before every tick and returns a TickInput,
+        or None to stop early; without one the player stands still. Returns the
+        number of ticks stepped.
+        """
+        start_tick = self.tick
+        end_tick = self.tick + ticks
+        profiler = self.profiler
+        while self.running and self.tick < end_tick:
+            inputs = policy(self) if policy is not None else TickInput()
+            if inputs is None:
+                break
+            if profiler is not None:
+                profiler.begin_frame()
+            with self.phase("update"):
+                self.update(inputs)
+            if profiler is not None:
+                profiler.end_frame(enemies=len(self.enemies), powerups=len(self.powerups))
+            mark_startup("first tick")
+        return self.tick - start_tick
+    
+    def nearest_enemy(self, x, y):
+        """(center_x, center_y, distance_sq) of the live enemy closest to (x, y), or None"""
+        if self.array_enemies:
+            enemies = self.enemies
+            n = enemies.count
+            if n == 0:
+                return None
+            center_x = enemies.x[:n] + enemies.width // 2
+            center_y = enemies.y[:n] + enemies.height // 2
+            distance_sq = (center_x - x) ** 2 + (center_y - y) ** 2
+            i = int(np.argmin(distance_sq))
+            return float(center_x[i]), float(center_y[i]), float(distance_sq[i])
+        nearest = None
+        for enemy in self.enemies:
+            if not enemy.alive:
+                continue
+            center_x = enemy.x + enemy.width // 2
+            center_y = enemy.y + enemy.height // 2
+            distance_sq = (center_x - x) ** 2 + (center_y - y) ** 2
+            if nearest is None or distance_sq < nearest[2]:
+                nearest = (center_x, center_y, distance_sq)
+        return nearest
+    
+    def update_enemies(self):
+        """Move and attack with every enemy, then remove the dead and score them"""
+        if self.effects is not None:
+            self.emit_death_puffs()
+        if self.separation is not None:
+            self.separation.steer(self.enemies)
+        flow_field = self.flow_field
+        if flow_field is not None:
+            flow_field.update(self.player.x, self.player.y, self.tick)
+        if self.array_enemies:
+            self.score += 10 * self.enemies.update(self.player, flow_field)
+        else:
+            for enemy in self.enemies:
+                enemy.update(self.player, flow_field)
+            self.score += 10 * self.enemies.compact()
+    
+    def emit_death_puffs(self):
+        """Puff particles where enemies killed this tick (not yet removed) fell"""
+        enemies = self.enemies
+        if self.array_enemies:
+            n = enemies.count
+            dead = ~enemies.alive[:n]
+            if dead.any():
+                self.effects.emit("puff", enemies.x[:n][dead] + enemies.width // 2,
+                                  enemies.y[:n][dead] + enemies.height // 2)
+        else:
+            dead = [enemy for enemy in enemies if not enemy.alive]
+            if dead:
+                self.effects.emit("puff", [enemy.x + enemy.width // 2 for enemy in dead],
+                                  [enemy.y + enemy.height // 2 for enemy in dead])
+    
+    def state_digest(self):
+        """Hash of the whole simulation state, for checking that a replay matches"""
+        digest = hashlib.blake2b(digest_size=16)
+        player = self.player
+        digest.update(repr((
+            self.tick, self.score, self.spawn_timer, self.powerup_spawn_timer,
+            float(player.x), float(player.y), player.health, player.punch_cooldown,
+            player.base_punch_cooldown, player.punch_timer, float(player.punch_angle),
+            player.invincible_timer, player.double_speed_timer,
+        )).encode())
+        for enemy in self.enemies:
+            digest.update(repr((float(enemy.x), float(enemy.y), enemy.health,
+                                enemy.attack_cooldown)).encode())
+        for powerup in self.powerups:
+            digest.update(repr((float(powerup.x), float(powerup.y), powerup.type)).encode())
+        return digest.digest()
+    
+    def snapshot(self):
+        """Serialize the simulation state to the compact binary snapshot format.
+        
+        Rendering, profiling and any input recording are not part of a snapshot.
+        """
+        player = self.player
+        version, mt_state, gauss_next = self.rng.getstate()
+        if self.array_enemies:
+            enemies = self.enemies
+            enemy_count = enemies.count
+            enemy_columns = [getattr(enemies, name)[:enemy_count].tobytes()
+                             for name, _ in _SNAPSHOT_ENEMY_COLUMNS]
+        else:
+            enemy_list = [enemy for enemy in self.enemies if enemy.alive]
+            enemy_count = len(enemy_list)
+            enemy_columns = [array(code, [getattr(enemy, name) for enemy in enemy_list]).tobytes()
+                             for name, code in _SNAPSHOT_ENEMY_COLUMNS]
+        powerup_list = [powerup for powerup in self.powerups if not powerup.collected]
+        powerup_columns = [
+            array("d", [powerup.x for powerup in powerup_list]).tobytes(),
+            array("d", [powerup.y for powerup in powerup_list]).tobytes(),
+            array("b", [POWERUP_TYPES.index(powerup.type) for powerup in powerup_list]).tobytes(),
         ]
-        for i, instruction in enumerate(instructions):
-            text = instruction_font.render(instruction, True, GRAY)
-            self.screen.blit(text, (SCREEN_WIDTH - 280, 10 + i * 25))
         
-        pygame.display.flip()
+        parts = [
+            _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, int(self.array_enemies)),
+            _SNAPSHOT_GAME.pack(*(getattr(self, name) for name, _ in _SNAPSHOT_GAME_FIELDS)),
+            _SNAPSHOT_PLAYER.pack(*(getattr(player, name) for name, _ in _SNAPSHOT_PLAYER_FIELDS)),
+            _SNAPSHOT_RNG.pack(*mt_state, gauss_next is not None, gauss_next or 0.0),
+            _SNAPSHOT_COUNTS.pack(len(player.hit_enemies), enemy_count, len(powerup_list)),
+        ]
+        size = sum(len(part) for part in parts)
+        parts.append(bytes(_padded(size) - size))
+        for column in [array("q", sorted(player.hit_enemies)).tobytes()] + enemy_columns + powerup_columns:
+            parts.append(column)
+            parts.append(bytes(_padded(len(column)) - len(column)))
+        return b"".join(parts)
+    
+    def restore(self, buffer):
+        """Replace the simulation state with a snapshot from Game.snapshot.
+        
+        With the array enemy backend and a writable buffer (bytearray, or the
+        copy-on-write mmap used by load_snapshot) the enemy columns are used in
+        place rather than copied. Snapshots restore into either backend.
+        """
+        magic, version, _ = _SNAPSHOT_HEADER.unpack_from(buffer)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("not a Zombie Puncher snapshot (or an unsupported version)")
+        if sys.byteorder != "little":
+            raise ValueError("snapshots can only be restored on little-endian machines")
+        offset = _SNAPSHOT_HEADER.size
+        for (name, _), value in zip(_SNAPSHOT_GAME_FIELDS, _SNAPSHOT_GAME.unpack_from(buffer, offset)):
+            setattr(self, name, value)
+        offset += _SNAPSHOT_GAME.size
+        player = self.player
+        for (name, _), value in zip(_SNAPSHOT_PLAYER_FIELDS, _SNAPSHOT_PLAYER.unpack_from(buffer, offset)):
+            setattr(player, name, value)
+        offset += _SNAPSHOT_PLAYER.size
+        rng_state = _SNAPSHOT_RNG.unpack_from(buffer, offset)
+        self.rng.setstate((3, rng_state[:625], rng_state[626] if rng_state[625] else None))
+        offset += _SNAPSHOT_RNG.size
+        hit_count, enemy_count, powerup_count = _SNAPSHOT_COUNTS.unpack_from(buffer, offset)
+        offset = _padded(offset + _SNAPSHOT_COUNTS.size)
+        
+        hit_uids, offset = _read_column(buffer, offset, "q", hit_count, False)
+        player.hit_enemies = set(hit_uids)
+        
+        columns = {}
+        for name, code in _SNAPSHOT_ENEMY_COLUMNS:
+            columns[name], offset = _read_column(buffer, offset, code, enemy_count, self.array_enemies)
+        if self.array_enemies:
+            enemies = EnemyArrays(capacity=max(enemy_count, 1))
+            if enemy_count:
+                for name, _ in _SNAPSHOT_ENEMY_COLUMNS:
+                    setattr(enemies, name, columns[name])
+            enemies.count = enemy_count
+            # The counter was restored with the game fields into the population being replaced
+            enemies.next_uid = self.enemies.next_uid
+            self.enemies = enemies
+        else:
+            for enemy in self.enemies:
+                enemy.alive = False
+            self.enemies.compact()
+            for i in range(enemy_count):
+                enemy = self.enemies.acquire(columns["x"][i], columns["y"][i], columns["uid"][i])
+                enemy.health = columns["health"][i]
+                enemy.attack_cooldown = columns["attack_cooldown"][i]
+                enemy.speed = columns["speed"][i]
+                enemy.max_health = columns["max_health"][i]
+        
+        powerup_columns = {}
+        for name, code in _SNAPSHOT_POWERUP_COLUMNS:
+            powerup_columns[name], offset = _read_column(buffer, offset, code, powerup_count, False)
+        for powerup in self.powerups:
+            powerup.collected = True
+        self.powerups.compact()
+        for i in range(powerup_count):
+            self.powerups.acquire(powerup_columns["x"][i], powerup_columns["y"][i],
+                                  POWERUP_TYPES[powerup_columns["type"][i]])
+        
+        if self.interpolate:
+            self.store_previous_positions()
+        if self.renderer is not None:
+            self.renderer.invalidate()
+    
+    def save_snapshot(self, path):
+        """Write a snapshot to path atomically (via a temporary file and rename)"""
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(self.snapshot())
+        os.replace(temp_path, path)
+    
+    def load_snapshot(self, path):
+        """Restore from a snapshot file, memory-mapped copy-on-write so array columns aren't copied"""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self.restore(buffer)
+    
+    def store_previous_positions(self):
+        """Remember where the player and enemies start this tick"""
+        player = self.player
+        player.prev_x = player.x
+        player.prev_y = player.y
+        if self.array_enemies:
+            n = self.enemies.count
+            self.enemies.prev_x[:n] = self.enemies.x[:n]
+            self.enemies.prev_y[:n] = self.enemies.y[:n]
+        else:
+            for enemy in self.enemies:
+                enemy.prev_x = enemy.x
+                enemy.prev_y = enemy.y
+    
+    @contextlib.contextmanager
+    def interpolated(self, alpha):
+        """Temporarily move the player and enemies `alpha` of the way from their
+        previous-tick positions to their current ones, e.g. to draw between ticks"""
+        player = self.player
+        player_x, player_y = player.x, player.y
+        player.x = player.prev_x + (player_x - player.prev_x) * alpha
+        player.y = player.prev_y + (player_y - player.prev_y) * alpha
+        if self.array_enemies:
+            enemies = self.enemies
+            n = enemies.count
+            saved = (enemies.x[:n].copy(), enemies.y[:n].copy())
+            enemies.x[:n] = enemies.prev_x[:n] + (saved[0] - enemies.prev_x[:n]) * alpha
+            enemies.y[:n] = enemies.prev_y[:n] + (saved[1] - enemies.prev_y[:n]) * alpha
+        else:
+            saved = [(enemy, enemy.x, enemy.y) for enemy in self.enemies]
+            for enemy, x, y in saved:
+                enemy.x = enemy.prev_x + (x - enemy.prev_x) * alpha
+                enemy.y = enemy.prev_y + (y - enemy.prev_y) * alpha
+        self.draw_alpha = alpha
+        try:
+            yield
+        finally:
+            self.draw_alpha = 1.0
+            player.x, player.y = player_x, player_y
+            if self.array_enemies:
+                enemies.x[:n], enemies.y[:n] = saved
+            else:
+                for enemy, x, y in saved:
+                    enemy.x = x
+                    enemy.y = y
     
-    def run(self):
+    def run(self, policy=None, render_fps=FPS, max_catch_up=5, max_render_skip=4):
+        """Play in the window, reading live input unless a policy is given.
+        
+        The simulation runs at a fixed FPS ticks per second of real time however
+        fast frames are drawn: elapsed time accumulates and is spent in whole
+        ticks, and each frame is drawn interpolated between the last two ticks.
+        Frames are capped at render_fps (0 for uncapped). At most max_catch_up
+        ticks run per frame; a frame still behind after them skips drawing to
+        give the time to ticks, and once max_render_skip frames in a row have
+        been skipped the remaining backlog is dropped (counted in dropped_ticks),
+        so an overloaded machine slows the game down instead of spiraling.
+        """
+        profiler = self.profiler
+        tick_seconds = 1 / FPS
+        self.interpolate = True
+        self.store_previous_positions()
+        accumulator = 0.0
+        skipped_renders = 0
+        previous = time.perf_counter()
         while self.running:
-            self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+            if profiler is not None:
+                profiler.begin_frame()
+            now = time.perf_counter()
+            accumulator += now - previous
+            previous = now
+            with self.phase("events"):
+                self.handle_events()
+            
+            ticks = 0
+            inputs = TickInput()
+            while accumulator >= tick_seconds and ticks < max_catch_up and self.running:
+                with self.phase("events"):
+                    inputs = policy(self) if policy is not None else self.read_input()
+                if inputs is None:
+                    break
+                with self.phase("update"):
+                    self.update(inputs)
+                accumulator -= tick_seconds
+                ticks += 1
+            if inputs is None:
+                break
+            
+            # Still behind after max_catch_up ticks: skip drawing so the next frame
+            # can spend the time on ticks, until too many frames have been skipped
+            behind = accumulator >= tick_seconds
+            rendered = not behind or skipped_renders >= max_render_skip
+            if behind and rendered:
+                # Too far behind to catch up; let the game run slow rather than spiral
+                dropped = int(accumulator / tick_seconds)
+                self.dropped_ticks += dropped
+                accumulator -= dropped * tick_seconds
+            if rendered:
+                skipped_renders = 0
+                with self.phase("draw"):
+                    with self.interpolated(accumulator / tick_seconds):
+                        self.draw()
+                mark_startup("first frame")
+            else:
+                skipped_renders += 1
+            with self.phase("wait"):
+                self.clock.tick(render_fps)
+            if profiler is not None:
+                profiler.end_frame(enemies=len(self.enemies), powerups=len(self.powerups),
+                                   ticks=ticks, rendered=rendered)
+        self.interpolate = False
+        self.emit_end()
         
         # Game over screen
         game_over_text = self.font.render(f"Game over nerd! Final Score: {self.score}", True, BLACK)
@@ -549,9 +2922,179 @@ class Game:
         # Wait for a few seconds before closing
         pygame.time.wait(3000)
         
+        clear_render_caches()
         pygame.quit()
 
+def bot_policy(game):
+    """Scripted player: punch at the nearest enemy and back away when it gets close"""
+    player = game.player
+    center_x = player.x + player.width // 2
+    center_y = player.y + player.height // 2
+    nearest = game.nearest_enemy(center_x, center_y)
+    if nearest is None:
+        return TickInput()
+    enemy_x, enemy_y, distance_sq = nearest
+    inputs = TickInput(punch=distance_sq < 90 * 90, aim_x=enemy_x, aim_y=enemy_y)
+    if distance_sq < 70 * 70:
+        inputs.left = enemy_x > center_x
+        inputs.right = enemy_x < center_x
+        inputs.up = enemy_y > center_y
+        inputs.down = enemy_y < center_y
+    return inputs
+
+def compare_backends(seed, ticks, make_policy=None, configure=None):
+    """Step an object-backend and an array-backend game with the same seed in lockstep.
+    
+    make_policy returns a fresh policy for each game (None stands still) and
+    configure is applied to both games before the first tick. Returns the first
+    tick after which their state digests differ, or None if they agree throughout.
+    """
+    games = [Game(headless=True, seed=seed), Game(headless=True, array_enemies=True, seed=seed)]
+    policies = []
+    for game in games:
+        if configure is not None:
+            configure(game)
+        policies.append(make_policy() if make_policy is not None else None)
+    for _ in range(ticks):
+        for game, policy in zip(games, policies):
+            game.update(policy(game) if policy is not None else TickInput())
+        if games[0].state_digest() != games[1].state_digest():
+            return games[0].tick
+        if not all(game.running for game in games):
+            break
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Zombie Puncher")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the simulation without a window, as fast as possible")
+    parser.add_argument("--ticks", type=int, default=FPS * 60,
+                        help="maximum ticks to simulate in headless mode")
+    parser.add_argument("--array-enemies", action="store_true",
+                        help="store enemies in NumPy arrays (needs numpy)")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only redraw and present the parts of the screen that changed")
+    parser.add_argument("--seed", type=int, help="seed for enemy and powerup spawns")
+    parser.add_argument("--bot", action="store_true",
+                        help="let bot_policy play instead of the keyboard and mouse")
+    parser.add_argument("--record", metavar="PATH", help="save this run's inputs to PATH")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="play back a recording (fast-forwarded with --headless)")
+    parser.add_argument("--render-fps", type=int, default=FPS,
+                        help="frames drawn per second in the window, e.g. 144 (0 for uncapped); "
+                             f"the simulation always runs at {FPS} ticks/s")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write per-frame phase timings to PATH (.csv or .json)")
+    parser.add_argument("--checkpoint", metavar="PATH",
+                        help="save a snapshot of the game to PATH every --checkpoint-every ticks")
+    parser.add_argument("--checkpoint-every", type=int, default=FPS * 10, metavar="TICKS")
+    parser.add_argument("--resume", metavar="PATH", help="start from a saved snapshot")
+    parser.add_argument("--separation", action="store_true",
+                        help="steer enemies apart so hordes don't stack up")
+    parser.add_argument("--flow-field", action="store_true",
+                        help="enemies path to the player over a shared flow field")
+    parser.add_argument("--telemetry", metavar="PATH",
+                        help="append gameplay events to PATH (rotated at 16 MB)")
+    parser.add_argument("--telemetry-format", choices=["jsonl", "columns"], default="jsonl")
+    parser.add_argument("--atlas", metavar="PATH", default=ATLAS_PATH,
+                        help="prebuilt sprite/glyph atlas to load if present (default: %(default)s)")
+    parser.add_argument("--build-atlas", action="store_true",
+                        help="render every sprite and HUD glyph into --atlas and exit")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long startup took, from process start to the first frame")
+    parser.add_argument("--waves", metavar="PATH",
+                        help="spawn enemies from a JSON wave script (see WaveScheduler)")
+    parser.add_argument("--compare-backends", action="store_true",
+                        help="run --ticks headless ticks on both enemy backends and report "
+                             "whether they stay identical")
+    args = parser.parse_args()
+    
+    if args.build_atlas:
+        build_atlas(args.atlas)
+        print(f"Wrote {args.atlas}")
+        return
+    if not args.headless:
+        load_atlas(args.atlas)
+    
+    recording = Recording.load(args.replay) if args.replay else None
+    seed = recording.seed if recording is not None else args.seed
+    policy = recording.player() if recording is not None else None
+    if policy is None and args.bot:
+        policy = bot_policy
+    
+    def configure(game):
+        if args.separation:
+            game.separation = Separation()
+        if args.flow_field:
+            game.flow_field = FlowField()
+        if args.waves:
+            game.waves = WaveScheduler.load(args.waves, seed=game.seed)
+    
+    if args.compare_backends:
+        if seed is None:
+            seed = random.getrandbits(32)
+        if recording is not None:
+            make_policy = recording.player
+        else:
+            make_policy = (lambda: bot_policy) if args.bot else None
+        ticks = len(recording) if recording is not None else args.ticks
+        diverged = compare_backends(seed, ticks, make_policy, configure)
+        if diverged is None:
+            print(f"Object and array backends match over {ticks} ticks (seed {seed})")
+        else:
+            print(f"Object and array backends DIVERGED at tick {diverged} (seed {seed})")
+        return
+    # The windowed game always has a profiler so F3 can show the overlay
+    profiler = None
+    if args.profile or not args.headless:
+        profiler = FrameProfiler(keep_trace=bool(args.profile))
+    game = Game(headless=args.headless, array_enemies=args.array_enemies,
+                dirty_rects=args.dirty_rects, seed=seed, record=bool(args.record),
+                profiler=profiler)
+    configure(game)
+    if args.resume:
+        game.load_snapshot(args.resume)
+    telemetry = None
+    if args.telemetry:
+        bus = TelemetryBus()
+        telemetry = TelemetryWriter(bus, args.telemetry, args.telemetry_format, tick_rate=FPS)
+        game.attach_telemetry(bus)
+    if args.checkpoint:
+        game.tick_hooks.append(checkpoint_hook(args.checkpoint, args.checkpoint_every))
+    
+    if args.headless:
+        ticks = len(recording) if recording is not None else args.ticks
+        start = time.perf_counter()
+        ticks = game.run_headless(ticks, policy)
+        elapsed = time.perf_counter() - start
+        print(f"Simulated {ticks} ticks in {elapsed:.3f}s "
+              f"({ticks / max(elapsed, 1e-9):.0f} ticks/s), score {game.score}, "
+              f"health {game.player.health}, seed {game.seed}")
+        game.emit_end()
+    else:
+        game.run(policy, render_fps=args.render_fps)
+    
+    if telemetry is not None:
+        telemetry.close()
+        for summary in telemetry.summary.results()[-1:]:
+            print(f"Telemetry: {summary['kills']} kills, {summary['damage_taken']} damage taken, "
+                  f"{summary['punches']} punches ({summary['hit_rate']:.0%} landed), "
+                  f"{summary['powerups']} powerups; {telemetry.written} events written, "
+                  f"{telemetry.bus.dropped} dropped")
+    
+    if recording is not None:
+        if recording.final_digest == game.state_digest():
+            print("Replay matches the recording")
+        else:
+            print("Replay DIVERGED from the recording")
+    if args.record:
+        game.recording.finish(game)
+        game.recording.save(args.record)
+    if args.profile:
+        profiler.export(args.profile)
+    if args.startup_report:
+        print("\n".join(startup_report()))
+
 # Run the game
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    main()
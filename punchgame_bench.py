@@ -0,0 +1,221 @@
+import os
+
+# Draw benchmarks need a display surface; use SDL's dummy driver unless told otherwise.
+# SDL reads these when a non-headless Game first initializes the display.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import datetime
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pygame
+import punchgame
+from punchgame import FPS, SCREEN_HEIGHT, SCREEN_WIDTH, Game, TickInput, percentile
+
+HORDE_SIZES = [100, 1000, 10000, 100000]
+PHASES = ["Game.update", "Player.check_punch_hits", "Enemy.update loop", "Game.draw"]
+
+def horde_game(size, backend, mode, seed):
+    """A game with `size` enemies scattered over and around the screen"""
+    game = Game(headless=(mode == "headless"), array_enemies=(backend == "arrays"), seed=seed)
+    rng = random.Random(seed)
+    for _ in range(size):
+        game.add_enemy(rng.uniform(-100, SCREEN_WIDTH + 100), rng.uniform(-100, SCREEN_HEIGHT + 100))
+    # Keep the player alive so every scenario runs for the full tick count
+    game.player.invincible_timer = 10 ** 9
+    # Stop the regular spawner from changing the horde size
+    game.spawn_timer = -10 ** 9
+    return game
+
+def punch_in_circles(game):
+    """Scripted player: punch whenever possible while the aim sweeps around the player"""
+    angle = game.tick * 0.1
+    player = game.player
+    return TickInput(punch=True,
+                     aim_x=player.x + player.width // 2 + math.cos(angle) * 100,
+                     aim_y=player.y + player.height // 2 + math.sin(angle) * 100)
+
+def instrument(owner, name, phase, on_call):
+    """Replace owner.name with a wrapper that reports each call to on_call(phase, call)"""
+    method = getattr(owner, name)
+
+    def wrapper(*args, **kwargs):
+        return on_call(phase, lambda: method(*args, **kwargs))
+
+    setattr(owner, name, wrapper)
+
+def instrument_game(game, on_call):
+    instrument(game, "update", "Game.update", on_call)
+    instrument(game.player, "check_punch_hits", "Player.check_punch_hits", on_call)
+    instrument(game, "update_enemies", "Enemy.update loop", on_call)
+    if not game.headless:
+        instrument(game, "draw", "Game.draw", on_call)
+
+def step(game, ticks):
+    for _ in range(ticks):
+        game.update(punch_in_circles(game))
+        if not game.headless:
+            game.draw()
+
+def time_phases(game, ticks):
+    """Per-call wall times in milliseconds for each instrumented phase"""
+    samples = {}
+
+    def timed(phase, call):
+        start = time.perf_counter()
+        result = call()
+        samples.setdefault(phase, []).append((time.perf_counter() - start) * 1000)
+        return result
+
+    instrument_game(game, timed)
+    step(game, ticks)
+    return samples
+
+def trace_phases(game, ticks):
+    """Net and peak traced allocations per call for each instrumented phase.
+
+    Runs separately from time_phases because tracemalloc slows everything down.
+    """
+    samples = {}
+
+    def traced(phase, call):
+        before_blocks = sys.getallocatedblocks()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = call()
+        current, peak = tracemalloc.get_traced_memory()
+        samples.setdefault(phase, []).append((current - before, peak - before,
+                                              sys.getallocatedblocks() - before_blocks))
+        return result
+
+    instrument_game(game, traced)
+    tracemalloc.start()
+    try:
+        step(game, ticks)
+    finally:
+        tracemalloc.stop()
+    return samples
+
+def summarize(times, allocations):
+    phases = {}
+    for phase in PHASES:
+        if phase not in times:
+            continue
+        values = times[phase]
+        summary = {
+            "calls": len(values),
+            "mean_ms": sum(values) / len(values),
+            "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95),
+            "max_ms": max(values),
+        }
+        traced = allocations.get(phase)
+        if traced:
+            summary["net_alloc_bytes"] = max(net for net, _, _ in traced)
+            summary["peak_alloc_bytes"] = max(peak for _, peak, _ in traced)
+            summary["net_blocks"] = max(blocks for _, _, blocks in traced)
+        phases[phase] = summary
+    return phases
+
+def run_scenario(size, backend, mode, ticks, trace_ticks, seed):
+    game = horde_game(size, backend, mode, seed)
+    times = time_phases(game, ticks)
+    allocations = {}
+    if trace_ticks:
+        allocations = trace_phases(horde_game(size, backend, mode, seed), trace_ticks)
+    return {
+        "scenario": f"horde-{size}",
+        "enemies": size,
+        "backend": backend,
+        "mode": mode,
+        "ticks": ticks,
+        "phases": summarize(times, allocations),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline):
+    """Print each phase's mean time relative to a previous results file"""
+    previous = {(r["scenario"], r["backend"], r["mode"]): r for r in baseline["results"]}
+    for result in results["results"]:
+        old = previous.get((result["scenario"], result["backend"], result["mode"]))
+        if old is None:
+            continue
+        for phase, summary in result["phases"].items():
+            old_summary = old["phases"].get(phase)
+            if old_summary is None:
+                continue
+            ratio = summary["mean_ms"] / max(old_summary["mean_ms"], 1e-9)
+            print(f"{result['scenario']:>12} {result['backend']:>7} {result['mode']:>11} "
+                  f"{phase:<24} {old_summary['mean_ms']:9.3f} -> {summary['mean_ms']:9.3f} ms "
+                  f"({ratio:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Zombie Puncher horde benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=HORDE_SIZES,
+                        help="horde sizes to run")
+    parser.add_argument("--backends", nargs="+", default=["objects", "arrays"],
+                        choices=["objects", "arrays"], help="enemy population backends to run")
+    parser.add_argument("--modes", nargs="+", default=["headless", "dummy-video"],
+                        choices=["headless", "dummy-video"],
+                        help="headless simulation only, or simulation plus drawing")
+    parser.add_argument("--ticks", type=int, default=FPS, help="timed ticks per scenario")
+    parser.add_argument("--trace-ticks", type=int, default=5,
+                        help="ticks per scenario traced for allocations (0 to skip)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", metavar="PATH", help="write JSON results to PATH")
+    parser.add_argument("--compare", metavar="PATH", help="compare against earlier JSON results")
+    args = parser.parse_args()
+
+    if "arrays" in args.backends and punchgame.np is None:
+        print("numpy is not installed; skipping the arrays backend", file=sys.stderr)
+        args.backends = [backend for backend in args.backends if backend != "arrays"]
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": punchgame.np.__version__ if punchgame.np is not None else None,
+            "platform": platform.platform(),
+            "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        },
+        "results": [],
+    }
+    for size in args.sizes:
+        for backend in args.backends:
+            for mode in args.modes:
+                result = run_scenario(size, backend, mode, args.ticks, args.trace_ticks, args.seed)
+                results["results"].append(result)
+                timings = ", ".join(f"{phase} {summary['mean_ms']:.3f} ms"
+                                    for phase, summary in result["phases"].items())
+                print(f"{result['scenario']} [{backend}, {mode}]: {timings}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
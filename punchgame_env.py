@@ -0,0 +1,296 @@
+import numpy as np
+
+from punchgame import POWERUP_TYPES, SCREEN_HEIGHT, SCREEN_WIDTH, Enemy, Game, Powerup
+
+# Columns of the (N, 7) action array, matching the fields of punchgame.TickInput
+ACTION_FIELDS = ("left", "right", "up", "down", "punch", "aim_x", "aim_y")
+
+class BatchedPunchEnv:
+    """N independent Zombie Puncher games stepped in lockstep with NumPy.
+
+    Every piece of game state (player, enemies, powerups, timers, score) lives
+    in arrays stacked along a leading game axis, and step() applies the rules
+    of Player.update, Enemy.update, Powerup.check_collision and Game.update to
+    all games at once. Finished games are reset in place.
+
+    Each game holds at most max_enemies enemies and max_powerups powerups;
+    spawns into a full game are skipped. Spawns come from a NumPy generator, so
+    runs follow the same rules as Game but not the same random sequence.
+    """
+
+    def __init__(self, num_envs, seed=None, max_enemies=64, max_powerups=8,
+                 max_episode_ticks=None, nearest_enemies=8, damage_penalty=1.0):
+        self.num_envs = num_envs
+        self.max_enemies = max_enemies
+        self.max_powerups = max_powerups
+        self.max_episode_ticks = max_episode_ticks
+        self.nearest_enemies = min(nearest_enemies, max_enemies)
+        self.damage_penalty = damage_penalty
+        self.rng = np.random.default_rng(seed)
+
+        # Rule constants come from the regular game objects so both stay in sync
+        game = Game(headless=True, seed=0)
+        player = game.player
+        enemy = Enemy(0, 0)
+        powerup = Powerup(0, 0, "speed")
+        self.player_width = player.width
+        self.player_height = player.height
+        self.player_speed = player.speed
+        self.player_max_health = player.max_health
+        self.default_punch_cooldown = player.base_punch_cooldown
+        self.punch_hit_radius = player.punch_hit_radius
+        self.punch_damage = player.punch_damage
+        self.enemy_width = enemy.width
+        self.enemy_height = enemy.height
+        self.enemy_speed = game.enemy_speed
+        self.enemy_max_health = enemy.max_health
+        self.powerup_size = powerup.width
+        self.spawn_interval = game.spawn_interval
+        self.powerup_spawn_interval = game.powerup_spawn_interval
+
+        n, e, p = num_envs, max_enemies, max_powerups
+        # Player and game state, one entry per game
+        self.player_x = np.zeros(n)
+        self.player_y = np.zeros(n)
+        self.health = np.zeros(n, dtype=np.int64)
+        self.punch_cooldown = np.zeros(n, dtype=np.int64)
+        self.base_punch_cooldown = np.zeros(n, dtype=np.int64)
+        self.punch_timer = np.zeros(n, dtype=np.int64)
+        self.punch_dir_x = np.zeros(n)
+        self.punch_dir_y = np.zeros(n)
+        self.invincible_timer = np.zeros(n, dtype=np.int64)
+        self.double_speed_timer = np.zeros(n, dtype=np.int64)
+        self.invincible = np.zeros(n, dtype=bool)
+        self.spawn_timer = np.zeros(n, dtype=np.int64)
+        self.powerup_spawn_timer = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        # Enemy slots, (games, max_enemies)
+        self.enemy_x = np.zeros((n, e))
+        self.enemy_y = np.zeros((n, e))
+        self.enemy_health = np.zeros((n, e), dtype=np.int64)
+        self.enemy_alive = np.zeros((n, e), dtype=bool)
+        self.attack_cooldown = np.zeros((n, e), dtype=np.int64)
+        self.enemy_hit = np.zeros((n, e), dtype=bool)  # Already hit by the current punch
+        # Powerup slots, (games, max_powerups); type indexes POWERUP_TYPES
+        self.powerup_x = np.zeros((n, p))
+        self.powerup_y = np.zeros((n, p))
+        self.powerup_type = np.zeros((n, p), dtype=np.int64)
+        self.powerup_active = np.zeros((n, p), dtype=bool)
+
+        self.observation_size = 8 + 4 * self.nearest_enemies + 5
+        self.reset()
+
+    def reset(self, mask=None):
+        """Start new episodes for the games in mask (all by default); returns observations"""
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        self.player_x[mask] = SCREEN_WIDTH // 2
+        self.player_y[mask] = SCREEN_HEIGHT // 2
+        self.health[mask] = self.player_max_health
+        self.punch_cooldown[mask] = 0
+        self.base_punch_cooldown[mask] = self.default_punch_cooldown
+        self.punch_timer[mask] = 0
+        self.punch_dir_x[mask] = 1.0
+        self.punch_dir_y[mask] = 0.0
+        self.invincible_timer[mask] = 0
+        self.double_speed_timer[mask] = 0
+        self.spawn_timer[mask] = 0
+        self.powerup_spawn_timer[mask] = 0
+        self.score[mask] = 0
+        self.ticks[mask] = 0
+        self.enemy_alive[mask] = False
+        self.enemy_hit[mask] = False
+        self.powerup_active[mask] = False
+        return self.observe()
+
+    def step(self, actions):
+        """Advance every game one tick.
+
+        actions is an (N, 7) array with columns ACTION_FIELDS. Returns
+        (observations, rewards, dones, info); info holds the final score and
+        length of episodes that ended this step, before their in-place reset.
+        """
+        actions = np.asarray(actions, dtype=np.float64)
+        left, right, up, down, punch = (actions[:, i] > 0.5 for i in range(5))
+        aim_x = actions[:, 5]
+        aim_y = actions[:, 6]
+        score_before = self.score.copy()
+        health_before = self.health.copy()
+        self.ticks += 1
+
+        self._step_player(left, right, up, down, punch, aim_x, aim_y)
+        self._step_enemies()
+        self._collect_powerups()
+        self._spawn()
+
+        rewards = (self.score - score_before) - self.damage_penalty * (health_before - self.health)
+        dones = self.health <= 0
+        if self.max_episode_ticks is not None:
+            dones |= self.ticks >= self.max_episode_ticks
+        info = {
+            "episode_score": np.where(dones, self.score, 0),
+            "episode_ticks": np.where(dones, self.ticks, 0),
+        }
+        if dones.any():
+            self.reset(dones)
+        return self.observe(), rewards.astype(np.float32), dones, info
+
+    def _step_player(self, left, right, up, down, punch, aim_x, aim_y):
+        # Player.punch
+        center_x = self.player_x + self.player_width // 2
+        center_y = self.player_y + self.player_height // 2
+        starting = punch & (self.punch_cooldown <= 0)
+        self.punch_cooldown[starting] = self.base_punch_cooldown[starting]
+        self.punch_timer[starting] = 10
+        self.enemy_hit[starting] = False
+        angle = np.arctan2(aim_y - center_y, aim_x - center_x)
+        self.punch_dir_x = np.where(starting, np.cos(angle), self.punch_dir_x)
+        self.punch_dir_y = np.where(starting, np.sin(angle), self.punch_dir_y)
+
+        # Powerup timers
+        self.invincible = self.invincible_timer > 0
+        self.invincible_timer[self.invincible] -= 1
+        self.double_speed_timer[self.double_speed_timer > 0] -= 1
+
+        # Movement, kept on screen
+        speed = self.player_speed
+        self.player_x += speed * (right.astype(np.int64) - left)
+        self.player_y += speed * (down.astype(np.int64) - up)
+        np.clip(self.player_x, 0, SCREEN_WIDTH - self.player_width, out=self.player_x)
+        np.clip(self.player_y, 0, SCREEN_HEIGHT - self.player_height, out=self.player_y)
+
+        self.punch_cooldown[self.punch_cooldown > 0] -= 1
+
+        # Punch animation and hits (Player.check_punch_hits)
+        punching = self.punch_timer > 0
+        self.punch_timer[punching] -= 1
+        self.enemy_hit[~punching] = False
+        extension = (10 - self.punch_timer) * 6
+        fist_x = self.player_x + self.player_width // 2 + self.punch_dir_x * extension
+        fist_y = self.player_y + self.player_height // 2 + self.punch_dir_y * extension
+        dx = fist_x[:, None] - (self.enemy_x + self.enemy_width // 2)
+        dy = fist_y[:, None] - (self.enemy_y + self.enemy_height // 2)
+        hits = ((dx * dx + dy * dy < self.punch_hit_radius ** 2) & self.enemy_alive
+                & ~self.enemy_hit & punching[:, None])
+        self.enemy_health[hits] -= self.punch_damage
+        self.enemy_hit |= hits
+        killed = hits & (self.enemy_health <= 0)
+        self.enemy_alive &= ~killed
+        self.score += 10 * killed.sum(axis=1)
+
+    def _step_enemies(self):
+        # Enemy.update: chase the player, attack when close
+        alive = self.enemy_alive
+        dx = self.player_x[:, None] - self.enemy_x
+        dy = self.player_y[:, None] - self.enemy_y
+        distance_sq = dx * dx + dy * dy
+        moving = alive & (distance_sq > 0)
+        distance = np.sqrt(distance_sq, where=moving, out=np.ones_like(distance_sq))
+        self.enemy_x += np.where(moving, (dx / distance) * self.enemy_speed, 0.0)
+        self.enemy_y += np.where(moving, (dy / distance) * self.enemy_speed, 0.0)
+
+        attacking = alive & (distance_sq < 40 * 40) & (self.attack_cooldown <= 0)
+        attacks = attacking.sum(axis=1)
+        self.health -= np.where(self.invincible, 0, 10 * attacks)
+        self.attack_cooldown[attacking] = 60
+        self.attack_cooldown[alive & (self.attack_cooldown > 0)] -= 1
+
+    def _collect_powerups(self):
+        # Powerup.check_collision and Player.activate_powerup
+        half = self.powerup_size // 2
+        dx = (self.player_x + self.player_width // 2)[:, None] - (self.powerup_x + half)
+        dy = (self.player_y + self.player_height // 2)[:, None] - (self.powerup_y + half)
+        collected = self.powerup_active & (dx * dx + dy * dy < 40 * 40)
+        speed = (collected & (self.powerup_type == 0)).any(axis=1)
+        invincible = (collected & (self.powerup_type == 1)).any(axis=1)
+        self.double_speed_timer[speed] = 300
+        self.base_punch_cooldown[speed] = 10
+        self.invincible_timer[invincible] = 180
+        self.powerup_active &= ~collected
+
+    def _spawn(self):
+        # Game.spawn_enemy: one enemy at a random screen edge every spawn_interval ticks
+        self.spawn_timer += 1
+        spawning = np.flatnonzero(self.spawn_timer >= self.spawn_interval)
+        self.spawn_timer[spawning] = 0
+        free = ~self.enemy_alive[spawning]
+        spawning = spawning[free.any(axis=1)]
+        if len(spawning):
+            slots = (~self.enemy_alive[spawning]).argmax(axis=1)
+            count = len(spawning)
+            side = self.rng.integers(0, 4, count)
+            along_x = self.rng.integers(0, SCREEN_WIDTH - self.enemy_width + 1, count)
+            along_y = self.rng.integers(0, SCREEN_HEIGHT - self.enemy_height + 1, count)
+            x = np.select([side == 0, side == 1, side == 2],
+                          [along_x, SCREEN_WIDTH, along_x], -self.enemy_width)
+            y = np.select([side == 0, side == 1, side == 2],
+                          [-self.enemy_height, along_y, SCREEN_HEIGHT], along_y)
+            self.enemy_x[spawning, slots] = x
+            self.enemy_y[spawning, slots] = y
+            self.enemy_health[spawning, slots] = self.enemy_max_health
+            self.enemy_alive[spawning, slots] = True
+            self.attack_cooldown[spawning, slots] = 0
+            self.enemy_hit[spawning, slots] = False
+
+        # Game.spawn_powerup: one powerup somewhere on screen every powerup_spawn_interval ticks
+        self.powerup_spawn_timer += 1
+        spawning = np.flatnonzero(self.powerup_spawn_timer >= self.powerup_spawn_interval)
+        self.powerup_spawn_timer[spawning] = 0
+        spawning = spawning[(~self.powerup_active[spawning]).any(axis=1)]
+        if len(spawning):
+            slots = (~self.powerup_active[spawning]).argmax(axis=1)
+            count = len(spawning)
+            self.powerup_x[spawning, slots] = self.rng.integers(50, SCREEN_WIDTH - 80 + 1, count)
+            self.powerup_y[spawning, slots] = self.rng.integers(50, SCREEN_HEIGHT - 80 + 1, count)
+            self.powerup_type[spawning, slots] = self.rng.integers(0, len(POWERUP_TYPES), count)
+            self.powerup_active[spawning, slots] = True
+
+    def observe(self):
+        """(N, observation_size) float32 features, scaled to roughly [-1, 1].
+
+        Player state, then the nearest enemies (dx, dy, health, present), then
+        the nearest powerup (dx, dy, is_speed, is_invincible, present).
+        """
+        n = self.num_envs
+        obs = np.zeros((n, self.observation_size), dtype=np.float32)
+        center_x = self.player_x + self.player_width // 2
+        center_y = self.player_y + self.player_height // 2
+        obs[:, 0] = self.player_x / SCREEN_WIDTH
+        obs[:, 1] = self.player_y / SCREEN_HEIGHT
+        obs[:, 2] = self.health / self.player_max_health
+        obs[:, 3] = self.punch_cooldown / self.default_punch_cooldown
+        obs[:, 4] = self.punch_timer / 10
+        obs[:, 5] = self.invincible_timer / 180
+        obs[:, 6] = self.double_speed_timer / 300
+        obs[:, 7] = self.enemy_alive.sum(axis=1) / self.max_enemies
+
+        k = self.nearest_enemies
+        dx = (self.enemy_x + self.enemy_width // 2) - center_x[:, None]
+        dy = (self.enemy_y + self.enemy_height // 2) - center_y[:, None]
+        distance_sq = np.where(self.enemy_alive, dx * dx + dy * dy, np.inf)
+        nearest = np.argpartition(distance_sq, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(distance_sq, nearest, axis=1).argsort(axis=1)
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        present = np.take_along_axis(self.enemy_alive, nearest, axis=1)
+        enemies = obs[:, 8:8 + 4 * k].reshape(n, k, 4)
+        enemies[:, :, 0] = np.take_along_axis(dx, nearest, axis=1) / SCREEN_WIDTH * present
+        enemies[:, :, 1] = np.take_along_axis(dy, nearest, axis=1) / SCREEN_HEIGHT * present
+        enemies[:, :, 2] = (np.take_along_axis(self.enemy_health, nearest, axis=1)
+                            / self.enemy_max_health * present)
+        enemies[:, :, 3] = present
+
+        half = self.powerup_size // 2
+        dx = (self.powerup_x + half) - center_x[:, None]
+        dy = (self.powerup_y + half) - center_y[:, None]
+        distance_sq = np.where(self.powerup_active, dx * dx + dy * dy, np.inf)
+        nearest = distance_sq.argmin(axis=1)[:, None]
+        present = np.take_along_axis(self.powerup_active, nearest, axis=1)[:, 0]
+        kind = np.take_along_axis(self.powerup_type, nearest, axis=1)[:, 0]
+        powerup = obs[:, 8 + 4 * k:]
+        powerup[:, 0] = np.take_along_axis(dx, nearest, axis=1)[:, 0] / SCREEN_WIDTH * present
+        powerup[:, 1] = np.take_along_axis(dy, nearest, axis=1)[:, 0] / SCREEN_HEIGHT * present
+        powerup[:, 2] = (kind == 0) & present
+        powerup[:, 3] = (kind == 1) & present
+        powerup[:, 4] = present
+        return obs
@@ -0,0 +1,560 @@
+import os
+import sys
+
+# Servers and load-test bots never draw; keep SDL away from real video and audio
+# devices unless this is the windowed thin client (which sets up its own display)
+if "play" not in sys.argv[1:2]:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import asyncio
+import math
+import multiprocessing
+import struct
+import time
+from collections import deque
+
+import pygame
+from punchgame import (FIST_SHAPE, FPS, POWERUP_TYPES, SCREEN_HEIGHT, SCREEN_WIDTH, Enemy, Game,
+                       Player, Powerup, TickInput, bot_policy, load_atlas, percentile)
+
+# Wire format, all little-endian. Both sides open with HELLO (the client's player id
+# is 0); after that the client streams fixed-size INPUT records and the server sends
+# one length-prefixed frame per tick:
+#   FRAME header, then PLAYER records, FULL enemy records (new enemies and any whose
+#   health changed or that moved too far for a MOVE), MOVE records (position delta
+#   from what that client last received), REMOVED enemy uids, and POWERUP records.
+# Positions are whole pixels; each client is only sent what is near its player.
+PROTOCOL_MAGIC = b"ZPMP"
+PROTOCOL_VERSION = 1
+_HELLO = struct.Struct("<4sBH")  # magic, version, player id
+_INPUT = struct.Struct("<IBhh")  # client tick, TickInput.buttons(), aim x, aim y
+_LENGTH = struct.Struct("<I")
+_FRAME = struct.Struct("<IHIBHHHB")  # tick, your id, score, players, full, move, removed, powerups
+_PLAYER = struct.Struct("<HhhhBBBHH")  # id, x, y, health, flags, fist bucket, extension, timers
+_FULL = struct.Struct("<Ihhh")  # uid, x, y, health
+_MOVE = struct.Struct("<Ibb")  # uid, dx, dy
+_REMOVED = struct.Struct("<I")
+_POWERUP = struct.Struct("<hhB")  # x, y, index into POWERUP_TYPES
+POWERUPS_UNCHANGED = 0xFF
+
+# Player record flag bits
+_PUNCHING = 1
+_INVINCIBLE = 2
+_DOUBLE_SPEED = 4
+
+RESPAWN_TICKS = FPS * 3
+
+def _pixel(value):
+    return max(-32768, min(32767, round(value)))
+
+class ArenaGame(Game):
+    """Game with any number of players sharing one horde.
+
+    Enemies chase whichever living player is nearest. Dead players respawn in the
+    middle of the arena after RESPAWN_TICKS; the score is shared. Enemies use the
+    object backend, whose spatial grid also drives interest management.
+    """
+    def __init__(self, headless=True, seed=None, profiler=None):
+        super().__init__(headless=headless, seed=seed, profiler=profiler)
+        self.players = {}
+        self.respawn_ticks = {}
+        self.next_player_id = 1
+        self.enemy_grid.mark_stale(self.enemies)
+
+    def add_player(self):
+        """Join a new player in the middle of the arena; returns its id"""
+        player_id = self.next_player_id
+        self.next_player_id += 1
+        self.players[player_id] = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+        return player_id
+
+    def remove_player(self, player_id):
+        self.players.pop(player_id, None)
+        self.respawn_ticks.pop(player_id, None)
+
+    def update(self, inputs=None):
+        """Advance one tick with a {player id: TickInput} dict (missing players stand still)"""
+        if inputs is None:
+            inputs = {}
+        self.tick += 1
+
+        # The enemy grid was marked stale after the last tick's moves and spawns, and
+        # nothing has moved since: the first query (a punch here, or the broadcast's
+        # interest queries) re-indexes it, once per tick
+        with self.phase("update.grid"):
+            self.powerup_grid.rebuild(self.powerups)
+
+        with self.phase("update.player"):
+            for player_id, player in self.players.items():
+                if player.health > 0:
+                    player.update(self.enemies, inputs.get(player_id) or TickInput(),
+                                  self.enemy_grid)
+                elif player_id not in self.respawn_ticks:
+                    self.respawn_ticks[player_id] = RESPAWN_TICKS
+                elif self.respawn_ticks[player_id] > 0:
+                    self.respawn_ticks[player_id] -= 1
+                else:
+                    del self.respawn_ticks[player_id]
+                    self.players[player_id] = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+
+        with self.phase("update.enemies"):
+            self.update_enemies()
+
+        with self.phase("update.powerups"):
+            for player in self.players.values():
+                if player.health > 0:
+                    self.collect_powerups(player)
+            self.powerups.compact()
+
+        self.update_spawners()
+        self.enemy_grid.mark_stale(self.enemies)
+
+        for hook in self.tick_hooks:
+            hook(self)
+
+    def update_enemies(self):
+        """Move every enemy toward (and attack) its nearest living player, then score the dead"""
+        if self.separation is not None:
+            self.separation.steer(self.enemies)
+        living = [player for player in self.players.values() if player.health > 0]
+        if living:
+            for enemy in self.enemies:
+                if not enemy.alive:
+                    continue
+                target = living[0]
+                if len(living) > 1:
+                    target = min(living, key=lambda player: (player.x - enemy.x) ** 2
+                                                            + (player.y - enemy.y) ** 2)
+                enemy.update(target)
+        self.score += 10 * self.enemies.compact()
+
+    def draw_players(self, screen):
+        return [player.draw(screen) for player in self.players.values()]
+
+class ClientSession:
+    """Server-side state for one connected client"""
+    def __init__(self, player_id, writer):
+        self.player_id = player_id
+        self.writer = writer
+        self.inputs = TickInput()
+        self.punch = False  # Latched until the next tick so short taps aren't lost
+        # What this client currently believes: {uid: (x, y, health)}, and its powerups
+        self.known = {}
+        self.known_powerups = ()
+        self.connected_at = time.perf_counter()
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def take_inputs(self):
+        inputs = self.inputs
+        inputs = TickInput(inputs.left, inputs.right, inputs.up, inputs.down, self.punch,
+                           inputs.aim_x, inputs.aim_y)
+        self.punch = False
+        return inputs
+
+class ArenaServer:
+    """Authoritative asyncio server running an ArenaGame at a fixed tick rate.
+
+    Every tick the latest input from each client is applied, the game advances
+    one step, and each client is sent a delta frame covering the enemies within
+    interest_radius of its player. At most max_updates enemy records go out per
+    frame; the rest follow on later ticks. A client whose socket buffer is over
+    max_buffer bytes skips frames until it drains - its deltas stay relative to
+    what it actually received, so nothing needs resending.
+    """
+    def __init__(self, game=None, tick_rate=FPS, interest_radius=400, max_updates=512,
+                 max_buffer=256 * 1024, window=600):
+        self.game = game if game is not None else ArenaGame()
+        self.tick_rate = tick_rate
+        self.interest_radius = interest_radius
+        self.max_updates = max_updates
+        self.max_buffer = max_buffer
+        self.sessions = {}
+        self.finished_sessions = []
+        # Server CPU per tick, in milliseconds, over the last `window` ticks
+        self.update_ms = deque(maxlen=window)
+        self.broadcast_ms = deque(maxlen=window)
+        self.late_ticks = 0
+
+    async def serve(self, host="127.0.0.1", port=7777, ticks=None, ready=None):
+        """Accept clients and run the tick loop for `ticks` ticks (forever if None)"""
+        server = await asyncio.start_server(self._handle_client, host, port)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await self.run_ticks(ticks)
+        for session in list(self.sessions.values()):
+            session.writer.close()
+
+    async def run_ticks(self, ticks=None):
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.tick_rate
+        next_tick = loop.time()
+        end_tick = None if ticks is None else self.game.tick + ticks
+        while end_tick is None or self.game.tick < end_tick:
+            self.step()
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # Overran the tick; don't try to catch up with a burst of ticks
+                self.late_ticks += 1
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def step(self):
+        """Run one authoritative tick and send every client its frame"""
+        # CPU time of this thread, so the metric isn't inflated by other processes
+        # (such as load-test bots on the same machine) being scheduled mid-tick
+        start = time.thread_time()
+        self.game.update({session.player_id: session.take_inputs()
+                          for session in self.sessions.values()})
+        updated = time.thread_time()
+        self.prepare_broadcast()
+        for session in self.sessions.values():
+            if session.writer.transport.get_write_buffer_size() > self.max_buffer:
+                session.frames_skipped += 1
+                continue
+            frame = self.encode_frame(session)
+            session.writer.write(_LENGTH.pack(len(frame)) + frame)
+            session.bytes_sent += _LENGTH.size + len(frame)
+            session.frames_sent += 1
+        done = time.thread_time()
+        self.update_ms.append((updated - start) * 1000)
+        self.broadcast_ms.append((done - updated) * 1000)
+
+    def prepare_broadcast(self):
+        """Encode what every client frame shares, once per tick rather than once per client"""
+        game = self.game
+        self.enemy_states = {}
+        for enemy in game.enemies:
+            self.enemy_states[id(enemy)] = (enemy.uid & 0xFFFFFFFF,
+                                            enemy.x + enemy.width // 2, enemy.y + enemy.height // 2,
+                                            (_pixel(enemy.x), _pixel(enemy.y), enemy.health))
+        self.player_records = []
+        for player_id, player in game.players.items():
+            flags = ((_PUNCHING if player.is_punching else 0)
+                     | (_INVINCIBLE if player.invincible else 0)
+                     | (_DOUBLE_SPEED if player.double_speed else 0))
+            self.player_records.append((player_id, player.x, player.y, _PLAYER.pack(
+                player_id, _pixel(player.x), _pixel(player.y), max(player.health, 0), flags,
+                player.punch_bucket, round(player.punch_extension),
+                player.invincible_timer, player.double_speed_timer)))
+
+    def encode_frame(self, session):
+        """The next frame for one client, updating what the server knows it has seen.
+
+        prepare_broadcast must have run since the last game update.
+        """
+        game = self.game
+        me = game.players[session.player_id]
+        center_x = me.x + me.width // 2
+        center_y = me.y + me.height // 2
+        radius = self.interest_radius
+        radius_sq = radius * radius
+
+        players = []
+        for player_id, x, y, record in self.player_records:
+            dx = x - me.x
+            dy = y - me.y
+            if player_id == session.player_id or dx * dx + dy * dy <= radius_sq:
+                players.append(record)
+
+        known = session.known
+        enemy_states = self.enemy_states
+        seen = set()
+        full = []
+        moves = []
+        budget = self.max_updates
+        for enemy in game.enemy_grid.query(center_x, center_y, radius):
+            uid, enemy_x, enemy_y, state = enemy_states[id(enemy)]
+            center_dx = enemy_x - center_x
+            center_dy = enemy_y - center_y
+            if center_dx * center_dx + center_dy * center_dy > radius_sq:
+                continue
+            seen.add(uid)
+            old = known.get(uid)
+            if old == state or budget == 0:
+                continue
+            budget -= 1
+            known[uid] = state
+            if old is not None and old[2] == state[2]:
+                dx = state[0] - old[0]
+                dy = state[1] - old[1]
+                if -128 <= dx <= 127 and -128 <= dy <= 127:
+                    moves.append(_MOVE.pack(uid, dx, dy))
+                    continue
+            full.append(_FULL.pack(uid, *state))
+        # Enemies that died or left the interest area
+        removed = []
+        for uid in known.keys() - seen:
+            del known[uid]
+            removed.append(_REMOVED.pack(uid))
+
+        powerups = tuple((_pixel(powerup.x), _pixel(powerup.y), POWERUP_TYPES.index(powerup.type))
+                         for powerup in game.powerups if not powerup.collected)
+        powerup_count = POWERUPS_UNCHANGED
+        powerup_records = []
+        if powerups != session.known_powerups:
+            session.known_powerups = powerups
+            powerup_count = len(powerups)
+            powerup_records = [_POWERUP.pack(*powerup) for powerup in powerups]
+
+        header = _FRAME.pack(game.tick & 0xFFFFFFFF, session.player_id, game.score, len(players),
+                             len(full), len(moves), len(removed), powerup_count)
+        return b"".join([header, *players, *full, *moves, *removed, *powerup_records])
+
+    async def _handle_client(self, reader, writer):
+        try:
+            magic, version, _ = _HELLO.unpack(await reader.readexactly(_HELLO.size))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        if magic != PROTOCOL_MAGIC or version != PROTOCOL_VERSION:
+            writer.close()
+            return
+        player_id = self.game.add_player()
+        session = ClientSession(player_id, writer)
+        writer.write(_HELLO.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, player_id))
+        self.sessions[player_id] = session
+        try:
+            while True:
+                _, buttons, aim_x, aim_y = _INPUT.unpack(await reader.readexactly(_INPUT.size))
+                session.inputs = TickInput(bool(buttons & 1), bool(buttons & 2), bool(buttons & 4),
+                                           bool(buttons & 8), bool(buttons & 16), aim_x, aim_y)
+                if buttons & 16:
+                    session.punch = True
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self.sessions[player_id]
+            self.finished_sessions.append(session)
+            self.game.remove_player(player_id)
+            writer.close()
+
+    def stats(self):
+        """Server CPU per tick and per-client bandwidth, for the load test report"""
+        tick_ms = [update + broadcast for update, broadcast in zip(self.update_ms, self.broadcast_ms)]
+        now = time.perf_counter()
+        sessions = list(self.sessions.values()) + self.finished_sessions
+        rates = [session.bytes_sent / max(now - session.connected_at, 1e-9) for session in sessions]
+        return {
+            "ticks": self.game.tick,
+            "clients": len(self.sessions),
+            "enemies": len(self.game.enemies),
+            "late_ticks": self.late_ticks,
+            "update_ms_p50": percentile(self.update_ms, 0.50) if tick_ms else 0.0,
+            "broadcast_ms_p50": percentile(self.broadcast_ms, 0.50) if tick_ms else 0.0,
+            "tick_ms_p50": percentile(tick_ms, 0.50) if tick_ms else 0.0,
+            "tick_ms_p95": percentile(tick_ms, 0.95) if tick_ms else 0.0,
+            "tick_ms_max": max(tick_ms, default=0.0),
+            "client_bytes_per_second_mean": sum(rates) / len(rates) if rates else 0.0,
+            "client_bytes_per_second_max": max(rates, default=0.0),
+            "frames_skipped": sum(session.frames_skipped for session in sessions),
+        }
+
+def apply_frame(game, frame, enemies):
+    """Mirror one server frame into a client-side ArenaGame.
+
+    `enemies` is the client's {uid: Enemy}; game.enemies should be its values().
+    """
+    (tick, player_id, score, player_count, full_count, move_count,
+     removed_count, powerup_count) = _FRAME.unpack_from(frame)
+    game.tick = tick
+    game.score = score
+    offset = _FRAME.size
+
+    players = {}
+    for _ in range(player_count):
+        (other_id, x, y, health, flags, bucket, extension, invincible_timer,
+         double_speed_timer) = _PLAYER.unpack_from(frame, offset)
+        offset += _PLAYER.size
+        player = game.players.get(other_id) or Player(x, y)
+        player.x = x
+        player.y = y
+        player.health = health
+        player.is_punching = bool(flags & _PUNCHING)
+        player.invincible = bool(flags & _INVINCIBLE)
+        player.double_speed = bool(flags & _DOUBLE_SPEED)
+        player.punch_extension = extension
+        if bucket != player.punch_bucket:
+            player.punch_bucket = bucket
+            player.punch_angle = bucket * 2 * math.pi / FIST_SHAPE.buckets
+            player.punch_dir_x = math.cos(player.punch_angle)
+            player.punch_dir_y = math.sin(player.punch_angle)
+        player.invincible_timer = invincible_timer
+        player.double_speed_timer = double_speed_timer
+        players[other_id] = player
+    game.players = players
+    if player_id in players:
+        game.player = players[player_id]
+
+    for _ in range(full_count):
+        uid, x, y, health = _FULL.unpack_from(frame, offset)
+        offset += _FULL.size
+        enemy = enemies.get(uid)
+        if enemy is None:
+            enemy = enemies[uid] = Enemy(x, y)
+            enemy.uid = uid
+        enemy.x = x
+        enemy.y = y
+        enemy.health = health
+    for _ in range(move_count):
+        uid, dx, dy = _MOVE.unpack_from(frame, offset)
+        offset += _MOVE.size
+        enemy = enemies[uid]
+        enemy.x += dx
+        enemy.y += dy
+    for _ in range(removed_count):
+        (uid,) = _REMOVED.unpack_from(frame, offset)
+        offset += _REMOVED.size
+        del enemies[uid]
+
+    if powerup_count != POWERUPS_UNCHANGED:
+        powerups = []
+        for _ in range(powerup_count):
+            x, y, kind = _POWERUP.unpack_from(frame, offset)
+            offset += _POWERUP.size
+            powerups.append(Powerup(x, y, POWERUP_TYPES[kind]))
+        game.powerups = powerups
+
+class ArenaClient:
+    """Thin client: sends inputs, mirrors server frames and draws them with the game's draw code"""
+    def __init__(self, headless=True):
+        self.game = ArenaGame(headless=headless)
+        self.enemies = {}
+        self.game.enemies = self.enemies.values()
+        self.game.powerups = []
+        self.player_id = None
+        self.frames = 0
+        self.bytes_received = 0
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, host, port):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.write(_HELLO.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, 0))
+        magic, version, self.player_id = _HELLO.unpack(await self.reader.readexactly(_HELLO.size))
+        if magic != PROTOCOL_MAGIC or version != PROTOCOL_VERSION:
+            raise ConnectionError("not a Zombie Puncher server (or an unsupported version)")
+
+    async def receive(self):
+        """Read and apply the next frame"""
+        (length,) = _LENGTH.unpack(await self.reader.readexactly(_LENGTH.size))
+        frame = await self.reader.readexactly(length)
+        apply_frame(self.game, frame, self.enemies)
+        self.frames += 1
+        self.bytes_received += _LENGTH.size + length
+
+    def send(self, inputs):
+        self.writer.write(_INPUT.pack(self.game.tick & 0xFFFFFFFF, inputs.buttons(),
+                                      _pixel(inputs.aim_x), _pixel(inputs.aim_y)))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    async def run(self, host, port):
+        """Connect and play in the window: frames are read in the background while
+        input is sent and the mirror drawn at FPS"""
+        await self.connect(host, port)
+        game = self.game
+        receiver = asyncio.ensure_future(self._receive_forever())
+        try:
+            while game.running and not receiver.done():
+                game.handle_events()
+                self.send(game.read_input())
+                game.draw()
+                await asyncio.sleep(1 / FPS)
+        finally:
+            receiver.cancel()
+            self.close()
+
+    async def _receive_forever(self):
+        try:
+            while True:
+                await self.receive()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+async def run_bot(host, port, seconds):
+    """Simulated client: plays bot_policy on its mirror and answers every frame with an input"""
+    client = ArenaClient()
+    await client.connect(host, port)
+    end = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < end:
+            await client.receive()
+            client.send(bot_policy(client.game))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        client.close()
+    return client
+
+async def run_bots(host, port, count, seconds):
+    clients = await asyncio.gather(*(run_bot(host, port, seconds) for _ in range(count)))
+    frames = sum(client.frames for client in clients)
+    received = sum(client.bytes_received for client in clients)
+    print(f"{count} bots received {frames} frames, {received / max(count, 1) / seconds:.0f} "
+          f"bytes/s per bot", file=sys.stderr)
+
+def _bots_process(host, port, count, seconds):
+    asyncio.run(run_bots(host, port, count, seconds))
+
+async def load_test(args):
+    """Serve on localhost while a separate process connects `clients` bots"""
+    server = ArenaServer(ArenaGame(seed=args.seed), tick_rate=args.tick_rate,
+                         interest_radius=args.interest_radius, max_updates=args.max_updates)
+    server.game.spawn_interval = args.spawn_interval
+    ready = asyncio.Event()
+    serving = asyncio.ensure_future(server.serve(args.host, args.port, ready=ready))
+    await ready.wait()
+    bots = multiprocessing.Process(target=_bots_process,
+                                   args=(args.host, args.port, args.clients, args.seconds))
+    bots.start()
+    await asyncio.sleep(args.seconds)
+    await asyncio.get_running_loop().run_in_executor(None, bots.join)
+    serving.cancel()
+    for name, value in server.stats().items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Zombie Puncher multiplayer server and clients")
+    parser.add_argument("command", choices=["serve", "play", "bots", "loadtest"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--seed", type=int, help="seed for enemy and powerup spawns")
+    parser.add_argument("--tick-rate", type=int, default=FPS, help="server ticks per second")
+    parser.add_argument("--interest-radius", type=int, default=400,
+                        help="pixels around a player within which it is sent enemies")
+    parser.add_argument("--max-updates", type=int, default=512,
+                        help="most enemy records sent to one client per frame")
+    parser.add_argument("--spawn-interval", type=int, default=10,
+                        help="ticks between enemy spawns in the load test")
+    parser.add_argument("--clients", type=int, default=32, help="bots to connect")
+    parser.add_argument("--seconds", type=float, default=10, help="how long bots play")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = ArenaServer(ArenaGame(seed=args.seed), tick_rate=args.tick_rate,
+                             interest_radius=args.interest_radius, max_updates=args.max_updates)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "play":
+        load_atlas()
+        client = ArenaClient(headless=False)
+        asyncio.run(client.run(args.host, args.port))
+        pygame.quit()
+    elif args.command == "bots":
+        asyncio.run(run_bots(args.host, args.port, args.clients, args.seconds))
+    else:
+        asyncio.run(load_test(args))
+
+if __name__ == "__main__":
+    main()
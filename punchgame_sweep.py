@@ -0,0 +1,168 @@
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from punchgame import FPS, Game, TickInput, bot_policy
+
+# Sweepable parameters and how each one is applied to a fresh Game
+TUNABLES = {
+    "enemy_speed": lambda game, value: setattr(game, "enemy_speed", value),
+    "spawn_interval": lambda game, value: setattr(game, "spawn_interval", int(value)),
+    "powerup_spawn_interval": lambda game, value: setattr(game, "powerup_spawn_interval", int(value)),
+    "base_punch_cooldown": lambda game, value: setattr(game.player, "base_punch_cooldown", int(value)),
+    "punch_hit_radius": lambda game, value: setattr(game.player, "punch_hit_radius", value),
+    "punch_damage": lambda game, value: setattr(game.player, "punch_damage", value),
+    "player_speed": lambda game, value: setattr(game.player, "speed", value),
+}
+
+POLICIES = {
+    "idle": lambda game: TickInput(),
+    "bot": bot_policy,
+}
+
+def parse_param(text):
+    """Parse name=v1,v2,... into (name, [values])"""
+    name, _, values = text.partition("=")
+    if name not in TUNABLES or not values:
+        raise argparse.ArgumentTypeError(
+            f"expected NAME=V1,V2,... with NAME one of {', '.join(TUNABLES)}")
+    return name, [float(value) if "." in value else int(value) for value in values.split(",")]
+
+def parse_seeds(text):
+    """Parse a seed list like 0-99 or 1,5,9"""
+    seeds = []
+    for part in text.split(","):
+        start, _, end = part.partition("-")
+        seeds.extend(range(int(start), int(end) + 1) if end else [int(start)])
+    return seeds
+
+def run_key(params, seed, policy_name, max_ticks, backend):
+    """Identifies a run; a result only stands in for a run with the same key"""
+    return json.dumps(params, sort_keys=True), seed, policy_name, max_ticks, backend
+
+def result_key(result):
+    # Results written before max_ticks and backend were recorded can't be matched
+    return run_key(result["params"], result["seed"], result["policy"],
+                   result.get("max_ticks"), result.get("backend"))
+
+def run_one(params, seed, policy_name, max_ticks, array_enemies):
+    """Play one headless game to the end (or max_ticks) and report how it went"""
+    game = Game(headless=True, array_enemies=array_enemies, seed=seed)
+    for name, value in params.items():
+        TUNABLES[name](game, value)
+    start = time.perf_counter()
+    ticks = game.run_headless(max_ticks, POLICIES[policy_name])
+    elapsed = time.perf_counter() - start
+    kills = game.score // 10
+    return {
+        "params": params,
+        "seed": seed,
+        "policy": policy_name,
+        "max_ticks": max_ticks,
+        "backend": "arrays" if array_enemies else "objects",
+        "survival_ticks": ticks,
+        "died": game.player.health <= 0,
+        "score": game.score,
+        "kills": kills,
+        "kills_per_second": kills / (ticks / FPS) if ticks else 0.0,
+        "sim_seconds": elapsed,
+    }
+
+def load_finished(path):
+    """Results already streamed to path by an earlier, possibly interrupted, sweep"""
+    results = []
+    if not os.path.exists(path):
+        return results
+    good_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+            if not line.endswith(b"\n"):
+                results.pop()
+                break
+            good_bytes += len(line)
+    # Drop a line cut short by a crash so new results append cleanly; that run is redone
+    with open(path, "r+b") as f:
+        f.truncate(good_bytes)
+    return results
+
+def aggregate(results):
+    """Mean and median outcome per parameter combination"""
+    groups = {}
+    for result in results:
+        groups.setdefault(json.dumps(result["params"], sort_keys=True), []).append(result)
+    summary = []
+    for key, runs in sorted(groups.items()):
+        entry = {"params": json.loads(key), "runs": len(runs),
+                 "death_rate": sum(run["died"] for run in runs) / len(runs)}
+        for metric in ("survival_ticks", "score", "kills_per_second"):
+            values = [run[metric] for run in runs]
+            entry[metric + "_mean"] = statistics.fmean(values)
+            entry[metric + "_median"] = statistics.median(values)
+        summary.append(entry)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Zombie Puncher parameter sweeps")
+    parser.add_argument("--param", type=parse_param, action="append", default=[],
+                        metavar="NAME=V1,V2", help="values to sweep for one tunable (repeatable)")
+    parser.add_argument("--seeds", type=parse_seeds, default=list(range(10)),
+                        help="seeds to run for every combination, e.g. 0-99 (default 0-9)")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="bot")
+    parser.add_argument("--max-ticks", type=int, default=FPS * 60 * 10,
+                        help="stop a run that survives this long")
+    parser.add_argument("--array-enemies", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default="sweep_results.jsonl",
+                        help="per-run results, appended as they finish; rerunning resumes")
+    parser.add_argument("--summary", metavar="PATH", help="write the aggregated table as JSON")
+    args = parser.parse_args()
+
+    names = [name for name, _ in args.param]
+    grid = [dict(zip(names, values)) for values in itertools.product(*(v for _, v in args.param))]
+    backend = "arrays" if args.array_enemies else "objects"
+    def key(params, seed):
+        return run_key(params, seed, args.policy, args.max_ticks, backend)
+
+    wanted = {key(params, seed) for params in grid for seed in args.seeds}
+    finished = [result for result in load_finished(args.output) if result_key(result) in wanted]
+    done = {result_key(result) for result in finished}
+    todo = [(params, seed) for params in grid for seed in args.seeds
+            if key(params, seed) not in done]
+    print(f"{len(grid) * len(args.seeds)} runs, {len(todo)} left, {args.workers} workers",
+          file=sys.stderr)
+
+    results = list(finished)
+    start = time.perf_counter()
+    with open(args.output, "a") as out, ProcessPoolExecutor(args.workers) as pool:
+        futures = [pool.submit(run_one, params, seed, args.policy, args.max_ticks,
+                               args.array_enemies) for params, seed in todo]
+        for i, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            # One flushed line per run, so a crash loses at most the runs in flight
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if i % 100 == 0 or i == len(futures):
+                print(f"{i}/{len(futures)} runs in {time.perf_counter() - start:.1f}s",
+                      file=sys.stderr)
+
+    summary = aggregate(results)
+    for entry in summary:
+        print(f"{entry['params']}: survival {entry['survival_ticks_mean']:.0f} ticks, "
+              f"score {entry['score_mean']:.1f}, kills/s {entry['kills_per_second_mean']:.3f}, "
+              f"deaths {entry['death_rate']:.0%} ({entry['runs']} runs)")
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
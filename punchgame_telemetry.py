@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+
+# Telemetry events and what their two values mean
+TELEMETRY_FIELDS = {
+    "start": ("seed", None),
+    "punch": ("bucket", None),
+    "hit": ("hits", "kills"),  # Per tick of a punch that connected
+    "damage": ("damage", "health"),
+    "powerup": ("type", None),
+    "end": ("score", "died"),
+}
+
+class TelemetryBus:
+    """Fixed-size ring buffer of compact (tick, event, a, b) gameplay records.
+    
+    The game thread is the only producer and one TelemetryWriter the only
+    consumer; each side only advances its own counter, so neither takes a lock
+    and emit never blocks. When the consumer falls behind and the ring is full,
+    new records are dropped and counted instead of growing memory.
+    """
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.head = 0  # Records ever emitted (advanced by the producer)
+        self.tail = 0  # Records ever drained (advanced by the consumer)
+        self.dropped = 0
+        self.tick = 0  # Stamped on each record; kept current by Game.update
+    
+    def emit(self, event, a=0, b=0):
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            return
+        self.slots[head % self.capacity] = (self.tick, event, a, b)
+        self.head = head + 1
+    
+    def drain(self, limit=None):
+        """Take up to `limit` of the oldest records (all of them by default)"""
+        tail = self.tail
+        head = self.head
+        if limit is not None:
+            head = min(head, tail + limit)
+        capacity = self.capacity
+        records = [self.slots[i % capacity] for i in range(tail, head)]
+        self.tail = head
+        return records
+
+class TelemetrySummary:
+    """Per-game analytics accumulated from telemetry records; tick_rate converts ticks to seconds"""
+    def __init__(self, tick_rate=60):
+        self.tick_rate = tick_rate
+        self.games = []
+        self.current = None
+    
+    def add(self, records):
+        for tick, event, a, b in records:
+            if event == "start" or self.current is None:
+                self.current = {"seed": a if event == "start" else None, "kills": 0,
+                                "damage_taken": 0, "punches": 0, "punches_landed": 0,
+                                "hits": 0, "powerups": 0, "ticks": 0, "died": False,
+                                "score": 0, "time_to_death": None}
+                self.games.append(self.current)
+                self._landed = False
+            game = self.current
+            game["ticks"] = tick
+            if event == "punch":
+                game["punches"] += 1
+                self._landed = False
+            elif event == "hit":
+                game["hits"] += a
+                game["kills"] += b
+                if not self._landed:
+                    game["punches_landed"] += 1
+                    self._landed = True
+            elif event == "damage":
+                game["damage_taken"] += a
+            elif event == "powerup":
+                game["powerups"] += 1
+            elif event == "end":
+                game["score"] = a
+                game["died"] = bool(b)
+                if b:
+                    game["time_to_death"] = tick / self.tick_rate
+    
+    def results(self):
+        return [dict(game, hit_rate=game["punches_landed"] / game["punches"] if game["punches"] else 0.0)
+                for game in self.games]
+
+class TelemetryWriter:
+    """Background thread that drains a TelemetryBus and appends batches to rotating files.
+    
+    "jsonl" writes one object per event; "columns" writes one object per batch
+    holding a list per field, which is much smaller for busy games. When the file
+    reaches rotate_bytes it is renamed to PATH.1 (older ones shifting up to
+    PATH.<backups>) and a fresh file started. summary accumulates per-game
+    analytics as records are written.
+    """
+    def __init__(self, bus, path, file_format="jsonl", flush_interval=0.25, batch_size=8192,
+                 rotate_bytes=16 * 1024 * 1024, backups=5, tick_rate=60):
+        if file_format not in ("jsonl", "columns"):
+            raise ValueError(f"unknown telemetry format {file_format!r}")
+        self.bus = bus
+        self.path = path
+        self.file_format = file_format
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.rotate_bytes = rotate_bytes
+        self.backups = backups
+        self.summary = TelemetrySummary(tick_rate)
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.file = open(path, "a")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+    
+    def flush(self):
+        """Write everything currently in the bus (called from the writer thread)"""
+        while True:
+            records = self.bus.drain(self.batch_size)
+            if not records:
+                return
+            self._write(records)
+            self.summary.add(records)
+    
+    def _write(self, records):
+        if self.file_format == "jsonl":
+            lines = []
+            for tick, event, a, b in records:
+                name_a, name_b = TELEMETRY_FIELDS[event]
+                record = {"tick": tick, "event": event, name_a: a}
+                if name_b is not None:
+                    record[name_b] = b
+                lines.append(json.dumps(record, separators=(",", ":")))
+            self.file.write("\n".join(lines) + "\n")
+        else:
+            ticks, events, a_values, b_values = zip(*records)
+            self.file.write(json.dumps({"tick": ticks, "event": events, "a": a_values, "b": b_values},
+                                       separators=(",", ":")) + "\n")
+        self.file.flush()
+        self.written += len(records)
+        self.batches += 1
+        if self.file.tell() >= self.rotate_bytes:
+            self._rotate()
+    
+    def _rotate(self):
+        self.file.close()
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a")
+        self.rotations += 1
+    
+    def close(self):
+        """Stop the thread after writing whatever is still buffered"""
+        self._stop.set()
+        self._thread.join()
+        self.file.close()
@@ -0,0 +1,65 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pytest
+
+import punchgame
+from punchgame import FlowField, Separation, WaveScheduler, bot_policy, compare_backends
+
+pytest.importorskip("numpy")
+
+WAVES = {
+    "waves": [
+        {"tick": 0, "count": 60, "type": "walker", "formation": "ring"},
+        {"tick": 120, "count": 200, "type": "runner", "formation": "edges", "duration": 30},
+        {"tick": 400, "count": 100, "type": "brute", "formation": "ring", "duration": 10},
+    ],
+    "repeat_every": 900,
+    "growth": 1.5,
+}
+
+
+def immortal(game):
+    # Keep the bot alive so runs cover every tick rather than stopping when it dies
+    game.player.health = game.player.max_health = 10 ** 9
+
+
+def configure(game):
+    immortal(game)
+    game.separation = Separation()
+    game.flow_field = FlowField()
+    game.waves = WaveScheduler.from_script(WAVES, seed=game.seed)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 4])
+def test_backends_match_with_crowd_features(seed):
+    assert compare_backends(seed, 1500, lambda: bot_policy, configure) is None
+
+
+@pytest.mark.parametrize("seed", [5, 6])
+def test_backends_match_with_default_spawns(seed):
+    assert compare_backends(seed, 1500, lambda: bot_policy, immortal) is None
+
+
+def test_compare_backends_covers_every_tick():
+    game = punchgame.Game(headless=True, array_enemies=True, seed=1)
+    configure(game)
+    for _ in range(1500):
+        game.update(bot_policy(game))
+    assert game.running
+    assert game.enemies.count > 100
+
+
+def test_compare_backends_reports_divergence(monkeypatch):
+    # Nudging only the array backend must be caught on the very next tick
+    original = punchgame.Game.update
+
+    def update(game, tick_input):
+        original(game, tick_input)
+        if game.array_enemies and game.tick == 50:
+            game.player.x += 1
+
+    monkeypatch.setattr(punchgame.Game, "update", update)
+    assert compare_backends(1, 100, lambda: bot_policy, configure) == 50